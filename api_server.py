@@ -0,0 +1,307 @@
+# ======================
+# API HTTP Inferensi
+# ======================
+# Server REST mandiri (tanpa Streamlit) agar kolektor kamera kolam dan
+# aplikasi web bisa memakai replika inferensi yang sama, dan replika bisa
+# ditambah terpisah dari UI. Hanya memakai pustaka standar Python.
+#
+#   python api_server.py --host 0.0.0.0 --port 8600
+#
+# Rute:
+#   GET  /health          -> proses hidup
+#   GET  /ready           -> 200 jika model sudah dimuat (+ backend & versi model), 503 jika
+#                            masih dimuat, 500 jika gagal dimuat (+ pesan error)
+#   GET  /stats           -> metrik mesin batching
+#   GET  /metrics         -> histogram waktu per tahap (format teks Prometheus)
+#   POST /predict         -> body: bytes gambar (image/jpeg, image/png)
+#   POST /predict/batch   -> body JSON: {"images": ["<base64>", ...]}
+#
+# Respons prediksi:
+#   {"label": ..., "confidence": ..., "status": "valid|ragu|bukan_ikan",
+#    "probabilities": {"<kelas>": p, ...}}
+import argparse
+import base64
+import binascii
+import io
+import json
+import logging
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config import IMG_SIZE, idx_to_class, interpret_prediction
+from inference import BatchingEngine, ModelLoader
+from prediction_cache import model_version
+from preprocessing import BatchBuffer, decode_resized
+from tracing import Tracer
+
+logger = logging.getLogger(__name__)
+
+UKURAN_BODY_MAKS = 20 * 2**20
+JUMLAH_GAMBAR_MAKS = 64
+
+
+def prediction_to_dict(probabilities):
+    label, confidence, status = interpret_prediction(probabilities)
+    return {
+        "label": label,
+        "confidence": round(confidence, 6),
+        "status": status,
+        "probabilities": {idx_to_class[i]: round(float(p), 6) for i, p in enumerate(probabilities)},
+    }
+
+
+class InferenceService:
+    # Menggabungkan loader model, thread pool decode, dan mesin batching
+    def __init__(self, load_fn, decode_workers=4, max_batch_size=16, max_latency_ms=10,
+                 request_timeout=30.0):
+        self.loader = ModelLoader(load_fn, warmup_shapes=((1, IMG_SIZE[1], IMG_SIZE[0], 3),))
+        self.decoder = ThreadPoolExecutor(max_workers=decode_workers, thread_name_prefix="api-decode")
+        self.max_batch_size = max_batch_size
+        self.max_latency_ms = max_latency_ms
+        self.request_timeout = request_timeout
+        self._engine = None
+        self._engine_lock = threading.Lock()
+        self.tracer = Tracer()
+
+    @property
+    def engine(self):
+        with self._engine_lock:
+            if self._engine is None:
+                backend = self.loader.wait(timeout=0)
+                self._engine = BatchingEngine(backend.predict, self.max_batch_size, self.max_latency_ms)
+            return self._engine
+
+    def predict(self, images):
+        # images: daftar bytes. Decode paralel, lalu setiap gambar masuk ke mesin batching
+        trace = self.tracer.start()
+        with trace.stage("decode"):
+            decoded = list(self.decoder.map(lambda data: decode_resized(io.BytesIO(data)), images))
+        with trace.stage("preprocess"):
+            buffer = BatchBuffer(len(decoded))
+            for i, arr in enumerate(decoded):
+                buffer.put(i, arr)
+        futures = [self.engine.submit(x) for x in buffer.view(len(decoded))]
+        try:
+            with trace.stage("inference"):
+                preds = [f.result(timeout=self.request_timeout) for f in futures]
+        except FutureTimeout:
+            for f in futures:
+                f.cancel()
+            raise
+        hasil = [prediction_to_dict(p) for p in preds]
+        trace.finish()
+        return hasil
+
+    def close(self):
+        self.decoder.shutdown(wait=False)
+        if self._engine is not None:
+            self._engine.stop()
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class InferenceHandler(BaseHTTPRequestHandler):
+    service = None  # diisi oleh make_server()
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        logger.info("%s - %s", self.address_string(), format % args)
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self):
+        panjang = int(self.headers.get("Content-Length") or 0)
+        if panjang <= 0:
+            raise ApiError(400, "Body kosong.")
+        if panjang > UKURAN_BODY_MAKS:
+            raise ApiError(413, "Body terlalu besar.")
+        return self.rfile.read(panjang)
+
+    def _require_ready(self):
+        if self.service.loader.failed:
+            raise ApiError(500, f"Model gagal dimuat: {self.service.loader.error}")
+        if not self.service.loader.ready:
+            raise ApiError(503, "Model sedang dimuat.")
+
+    def do_GET(self):
+        loader = self.service.loader
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        elif self.path == "/ready":
+            if loader.ready:
+                backend = loader.backend
+                self._send_json(200, {"ready": True, "backend": backend.name,
+                                      "model_version": f"{backend.name}:{model_version(backend.path)}"})
+            elif loader.failed:
+                # Bukan 503: klien tidak boleh menunggu model yang tidak akan pernah siap
+                self._send_json(500, {"ready": False, "loading": False,
+                                      "error": f"Model gagal dimuat: {loader.error}"})
+            else:
+                self._send_json(503, {"ready": False, "loading": True, "error": "Model sedang dimuat."})
+        elif self.path == "/stats":
+            self._send_json(200, self.service.engine.stats() if loader.ready else {})
+        elif self.path == "/metrics":
+            body = self.service.tracer.to_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        else:
+            self._send_json(404, {"error": "Rute tidak ditemukan."})
+
+    def do_POST(self):
+        try:
+            if self.path == "/predict":
+                self._require_ready()
+                hasil = self.service.predict([self._read_body()])[0]
+                self._send_json(200, hasil)
+            elif self.path == "/predict/batch":
+                self._require_ready()
+                images = self._parse_batch(self._read_body())
+                self._send_json(200, {"results": self.service.predict(images)})
+            else:
+                self._send_json(404, {"error": "Rute tidak ditemukan."})
+        except ApiError as e:
+            # Body mungkin belum terbaca; jangan pakai ulang koneksi ini
+            self.close_connection = True
+            self._send_json(e.status, {"error": str(e)})
+        except FutureTimeout:
+            self._send_json(504, {"error": "Waktu inferensi habis."})
+        except OSError as e:
+            # Pillow melempar OSError/UnidentifiedImageError untuk gambar rusak
+            self._send_json(400, {"error": f"Gambar tidak bisa dibaca: {e}"})
+        except Exception as e:
+            logger.exception("Kesalahan saat memproses %s", self.path)
+            self._send_json(500, {"error": repr(e)})
+
+    @staticmethod
+    def _parse_batch(body):
+        try:
+            payload = json.loads(body)
+            encoded = payload["images"]
+        except (ValueError, KeyError, TypeError):
+            raise ApiError(400, 'Body harus JSON {"images": ["<base64>", ...]}.')
+        if not isinstance(encoded, list) or not encoded:
+            raise ApiError(400, "Daftar images kosong.")
+        if len(encoded) > JUMLAH_GAMBAR_MAKS:
+            raise ApiError(413, f"Maksimal {JUMLAH_GAMBAR_MAKS} gambar per permintaan.")
+        try:
+            return [base64.b64decode(item, validate=True) for item in encoded]
+        except (binascii.Error, TypeError):
+            raise ApiError(400, "Gambar harus dikodekan base64.")
+
+
+def make_server(host, port, service):
+    handler = type("BoundInferenceHandler", (InferenceHandler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+# ======================
+# Klien
+# ======================
+def encode_for_api(img):
+    # Klien cukup mengirim gambar yang sudah di-resize ke 299x299 dalam PNG
+    # (lossless & kecil); server tidak perlu resize lagi.
+    from PIL import Image
+    from preprocessing import resize_to_array
+    buf = io.BytesIO()
+    Image.fromarray(resize_to_array(img)).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+class RemoteError(RuntimeError):
+    # Server API tidak bisa dihubungi atau menolak permintaan; status = kode HTTP jika ada
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+def _request_remote(req, timeout):
+    import socket
+    import urllib.error
+    import urllib.request
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        # Server mengirim {"error": ...}, mis. 503 "Model sedang dimuat."
+        try:
+            pesan = json.loads(e.read()).get("error") or e.reason
+        except (ValueError, AttributeError):
+            pesan = e.reason
+        raise RemoteError(f"API {e.code}: {pesan}", status=e.code) from e
+    except urllib.error.URLError as e:
+        raise RemoteError(f"API tidak bisa dihubungi: {e.reason}") from e
+    except (socket.timeout, TimeoutError) as e:
+        raise RemoteError("Waktu permintaan ke API habis.") from e
+    except ValueError as e:
+        raise RemoteError(f"Respons API tidak valid: {e}") from e
+
+
+def predict_remote(api_url, image_bytes, timeout=30.0):
+    # Dipakai app.py jika IKANCHECK_API_URL diset
+    import urllib.request
+    req = urllib.request.Request(
+        api_url.rstrip("/") + "/predict", data=image_bytes,
+        headers={"Content-Type": "application/octet-stream"}, method="POST",
+    )
+    return _request_remote(req, timeout)
+
+
+def remote_status(api_url, timeout=2.0):
+    # Isi /ready: {"ready": True, "backend": ..., "model_version": ...}
+    import urllib.request
+    return _request_remote(urllib.request.Request(api_url.rstrip("/") + "/ready"), timeout)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Server HTTP inferensi penyakit ikan.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--backend", default=None, help="keras / tflite-dynamic / tflite-fp16 / onnx / auto")
+    parser.add_argument("--decode-workers", type=int, default=4)
+    parser.add_argument("--max-batch-size", type=int, default=16)
+    parser.add_argument("--max-latency-ms", type=float, default=10)
+    parser.add_argument("--timeout", type=float, default=30.0, help="Batas waktu inferensi per permintaan (detik)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    from backends import load_backend
+    service = InferenceService(
+        lambda: load_backend(args.backend),
+        decode_workers=args.decode_workers,
+        max_batch_size=args.max_batch_size,
+        max_latency_ms=args.max_latency_ms,
+        request_timeout=args.timeout,
+    )
+    server = make_server(args.host, args.port, service)
+    logger.info("Mendengarkan di http://%s:%d", args.host, args.port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
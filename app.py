@@ -2,12 +2,24 @@
 import streamlit as st
 import os
 import numpy as np
-from tensorflow.keras.models import load_model
-from tensorflow.keras.preprocessing import image
 from PIL import Image
-from datetime import datetime
-import plotly.express as px
-import pandas as pd
+from inference import BatchingEngine, ModelLoader
+from api_server import RemoteError, encode_for_api, predict_remote, remote_status
+from backends import load_backend
+from config import (AMBANG_BATAS, HISTORY_DIR, IMG_SIZE, idx_to_class, interpret_prediction,
+                    PREDICTION_CACHE_SIZE, PREDICTION_CACHE_DIR, PREDICTION_CACHE_DISK_SIZE, TTA_VIEWS, TTA_BUDGET_MS,
+                    VIDEO_SAMPLE_FPS, VIDEO_SMOOTHING, STATUS_BUKAN_IKAN, STATUS_RAGU,
+                    FISH_GATE_PATH, FISH_GATE_THRESHOLD, LABEL_BUKAN_IKAN, class_labels)
+from prediction_cache import PredictionCache, image_key, model_version
+from history_store import HistoryStore
+from dedup import DuplicateDetector, to_signed
+from statistik import StatsAggregator
+from tta import MAKS_VIEWS, TTAPredictor
+from fish_gate import FishGate, load_keras_model, rejection_probabilities
+from tracing import Tracer
+from history_writer import HistoryWriter, WriterBusy
+from thumbnails import ensure_thumbnail, remove_thumbnail
+from preprocessing import PREVIEW_SIZE, load_image, preprocess_image
 
 # ======================
 # Konfigurasi Halaman Utama
@@ -50,29 +62,110 @@ st.markdown("""
 # ======================
 # Pemuatan Model & Konfigurasi Awal
 # ======================
-# Gunakan cache untuk memuat model agar tidak diulang setiap kali ada interaksi
+# Gunakan cache untuk memuat model agar tidak diulang setiap kali ada interaksi.
+# Backend tercepat yang tersedia (ONNX / TFLite / Keras) dipilih otomatis.
+# Model (beserta TensorFlow) dimuat dan dipanaskan di thread latar belakang
+# sejak run pertama, jadi halaman yang tidak memakai model tidak ikut menunggu.
+BATCH_MAKSIMUM = 16
+
+# Jika IKANCHECK_API_URL diset (mis. http://127.0.0.1:8600), aplikasi ini hanya
+# menjadi klien dari api_server.py dan tidak memuat model sendiri.
+API_URL = os.environ.get("IKANCHECK_API_URL")
+
 @st.cache_resource
-def load_keras_model():
-    model = load_model("model999.h5")
-    return model
-
-model = load_keras_model()
-
-class_labels = {
-    "Bacterial Red disease": 0,
-    "Bacterial diseases - Aeromoniasis": 1,
-    "Bacterial gill disease": 2,
-    "Fungal diseases Saprolegniasis": 3,
-    "Healthy Fish": 4,
-    "Parasitic diseases": 5,
-    "Viral diseases White tail disease": 6,
-    "bukan ikan": 7
-}
-idx_to_class = {v: k for k, v in class_labels.items()}
+def get_model_loader():
+    return ModelLoader(load_backend, warmup_shapes=(
+        (1, IMG_SIZE[1], IMG_SIZE[0], 3),
+        (BATCH_MAKSIMUM, IMG_SIZE[1], IMG_SIZE[0], 3),
+    ))
+
+model_loader = None if API_URL else get_model_loader()
+
+# Satu mesin batching dibagi oleh semua sesi: permintaan dari banyak pengguna
+# digabung menjadi satu forward pass, bukan diantrekan satu per satu.
+@st.cache_resource
+def get_batching_engine():
+    backend = model_loader.wait()
+    return BatchingEngine(backend.predict, max_batch_size=BATCH_MAKSIMUM, max_latency_ms=10)
+
+# Status server API (/ready) dibaca ulang paling lama setiap 5 detik, untuk
+# indikator sidebar dan versi cache prediksi
+@st.cache_data(ttl=5, show_spinner=False)
+def get_api_status():
+    try:
+        return remote_status(API_URL)
+    except RemoteError as e:
+        # 503 = model di server masih dimuat; 500 = gagal dimuat, error ditampilkan
+        return {"ready": False, "loading": e.status == 503, "error": str(e)}
+
+# Hasil kuantisasi sedikit berbeda dari H5, jadi nama backend ikut menjadi bagian versi.
+# Dalam mode API, versi model diambil dari server agar cache tidak bertahan
+# setelah model di server diganti.
+def get_model_version():
+    if API_URL:
+        status = get_api_status()
+        if not status.get("ready"):
+            raise RemoteError(status.get("error") or "Server API belum siap.")
+        return f"api:{API_URL}:{status.get('model_version', status.get('backend'))}"
+    return get_local_model_version()
+
+@st.cache_resource
+def get_local_model_version():
+    backend = model_loader.wait()
+    versi = f"{backend.name}:{model_version(backend.path)}"
+    # Hasil gerbang "bukan ikan" ikut di-cache, jadi bobot & ambangnya bagian dari versi
+    if fish_gate_unavailable() is None:
+        versi += f"+gerbang:{model_version(FISH_GATE_PATH)}@{FISH_GATE_THRESHOLD}"
+    return versi
+
+# Cache hasil prediksi berdasarkan isi gambar, agar unggahan ulang foto yang sama
+# tidak menjalankan Xception lagi
+@st.cache_resource
+def get_prediction_cache():
+    return PredictionCache(PREDICTION_CACHE_SIZE, disk_dir=PREDICTION_CACHE_DIR,
+                           disk_capacity=PREDICTION_CACHE_DISK_SIZE)
+
+prediction_cache = get_prediction_cache()
 
-HISTORY_DIR = "riwayat_upload"
 os.makedirs(HISTORY_DIR, exist_ok=True)
 
+# Riwayat disimpan di SQLite; gambar lama di riwayat_upload diimpor sekali saat database masih kosong
+@st.cache_resource
+def get_history_store():
+    store = HistoryStore()
+    if store.is_empty():
+        store.import_legacy()
+    return store
+
+history_store = get_history_store()
+
+# Indeks hash perseptual riwayat: unggahan yang hampir sama dengan deteksi
+# sebelumnya memakai ulang hasilnya tanpa inferensi dan tanpa disimpan lagi.
+# Catatan lama tanpa hash diisi dengan `python dedup.py`.
+@st.cache_resource
+def get_duplicate_detector():
+    return DuplicateDetector(history_store)
+
+duplicate_detector = get_duplicate_detector()
+
+# Penyimpanan gambar + thumbnail + catatan riwayat dikerjakan thread latar belakang
+@st.cache_resource
+def get_history_writer():
+    return HistoryWriter(history_store, on_saved=duplicate_detector.add)
+
+history_writer = get_history_writer()
+
+# Agregat statistik diperbarui di setiap deteksi; saat pertama kali dibuat,
+# diisi dari riwayat yang sudah ada
+@st.cache_resource
+def get_stats_aggregator():
+    aggregator = StatsAggregator()
+    if aggregator.is_empty():
+        aggregator.backfill_from_history()
+    return aggregator
+
+stats_aggregator = get_stats_aggregator()
+
 # ======================
 # Database Teks (Saran & Edukasi)
 # ======================
@@ -172,22 +265,149 @@ edukasi_lengkap = {
 }
 
 
+# ======================
+# Pencatatan Waktu per Tahap
+# ======================
+# IKANCHECK_TRACE_FILE (opsional): path file JSON tempat histogram waktu diekspor berkala
+@st.cache_resource
+def get_tracer():
+    return Tracer(export_path=os.environ.get("IKANCHECK_TRACE_FILE"))
+
+tracer = get_tracer()
+
+# Gerbang "bukan ikan" (opsional, aktif jika fish_gate.npz sudah dilatih):
+# blok awal Xception yang sama menolak gambar yang jelas bukan ikan sebelum
+# model penuh dijalankan. Ekstraktornya dipotong dari model Keras yang sudah
+# dimuat backend, jadi gerbang hanya aktif untuk backend keras; backend lain
+# berarti memuat TensorFlow + model999.h5 kedua kalinya.
+def fish_gate_unavailable():
+    # Alasan gerbang nonaktif (tanpa memuat apa pun), atau None jika bisa dipakai
+    if API_URL:
+        return "mode API"
+    if not os.path.exists(FISH_GATE_PATH):
+        return f"{FISH_GATE_PATH} belum dilatih"
+    if model_loader.backend is None:
+        return "model belum dimuat"
+    if model_loader.backend.name != "keras":
+        return f"backend {model_loader.backend.name}, bukan keras"
+    return None
+
+# Status gerbang yang sudah dibangun; sidebar hanya membaca ini
+@st.cache_resource
+def get_fish_gate_state():
+    return {}
+
+@st.cache_resource
+def _load_fish_gate():
+    state = get_fish_gate_state()
+    try:
+        gate = FishGate.load(FISH_GATE_PATH, model=load_keras_model(model_loader.backend))
+        state.update(gate=gate, alasan=None)
+    except Exception as e:
+        state.update(gate=None, alasan=repr(e))
+    return state["gate"], state["alasan"]
+
+def get_fish_gate():
+    # Dibangun saat deteksi pertama, setelah model selesai dimuat.
+    # Mengembalikan (gerbang atau None, alasan nonaktif).
+    alasan = fish_gate_unavailable()
+    if alasan is not None:
+        return None, alasan
+    return _load_fish_gate()
+
 # ======================
 # Fungsi Prediksi
 # ======================
-def model_prediction(img):
-    img = img.resize((299, 299))
-    x = image.img_to_array(img)
-    x = np.expand_dims(x, axis=0) / 255.0
-    preds = model.predict(x)
-    # Mengembalikan seluruh array probabilitas prediksi
-    return preds[0]
+def model_prediction(img, trace):
+    with trace.stage("cache"):
+        key = image_key(img, get_model_version())
+        cached = prediction_cache.get(key)
+    if cached is not None:
+        return cached
+
+    if API_URL:
+        with trace.stage("inference_api"):
+            hasil = predict_remote(API_URL, encode_for_api(img))
+        preds = np.array([hasil["probabilities"][idx_to_class[i]] for i in range(len(idx_to_class))],
+                         dtype=np.float32)
+    else:
+        with trace.stage("preprocess"):
+            x = preprocess_image(img)
+        fish_gate, _ = get_fish_gate()
+        if fish_gate is not None:
+            with trace.stage("gate"):
+                ditolak, p_bukan_ikan = fish_gate.check(x)
+            if ditolak:
+                preds = rejection_probabilities(p_bukan_ikan)
+                prediction_cache.put(key, preds)
+                return preds
+        # Mengembalikan seluruh array probabilitas prediksi
+        with trace.stage("inference"):
+            preds = get_batching_engine().predict(x)
+    prediction_cache.put(key, preds)
+    return preds
+
+# TTA memanggil backend langsung (bukan lewat mesin batching) agar semua
+# variasi gambar masuk dalam satu forward pass
+@st.cache_resource
+def get_tta_predictor():
+    backend = model_loader.wait()
+    return TTAPredictor(backend.predict)
 
 # ======================
 # Sidebar Navigasi
 # ======================
 st.sidebar.title("🧭 Navigasi")
-page = st.sidebar.selectbox("Pilih Halaman", ["🏠 Beranda", "🔍 Deteksi Penyakit", "📚 Edukasi Penyakit", "📝 Riwayat", "ℹ️ Tentang"])
+page = st.sidebar.selectbox("Pilih Halaman", ["🏠 Beranda", "🔍 Deteksi Penyakit", "🎥 Deteksi Video", "📚 Edukasi Penyakit", "📝 Riwayat", "📊 Statistik", "ℹ️ Tentang"])
+
+# Indikator kesiapan model
+if API_URL:
+    status_api = get_api_status()
+    if status_api.get("ready"):
+        st.sidebar.success(f"🌐 API siap ({status_api.get('backend')}): {API_URL}")
+    elif status_api.get("loading"):
+        st.sidebar.warning(f"🟡 Server API sedang memuat model: {API_URL}")
+    else:
+        st.sidebar.error(f"🔴 API tidak tersedia: {status_api['error']}")
+elif model_loader.ready:
+    st.sidebar.success(f"🟢 Model siap ({model_loader.load_seconds:.1f} dtk)")
+elif model_loader.failed:
+    st.sidebar.error(f"🔴 Model gagal dimuat: {model_loader.error}")
+else:
+    st.sidebar.warning("🟡 Model sedang dimuat...")
+
+if model_loader is not None and model_loader.ready:
+    with st.sidebar.expander("⚙️ Status Mesin Inferensi"):
+        engine_stats = get_batching_engine().stats()
+        st.caption(f"Backend: {model_loader.backend.name}")
+        alasan_gate = fish_gate_unavailable()
+        status_gate = get_fish_gate_state()
+        if alasan_gate is None and not status_gate:
+            st.caption("Gerbang bukan ikan: dimuat saat deteksi pertama")
+        elif alasan_gate is None and status_gate["gate"] is not None:
+            st.caption(f"Gerbang bukan ikan: aktif (ambang {status_gate['gate'].threshold:.2f})")
+        else:
+            st.caption(f"Gerbang bukan ikan: nonaktif ({alasan_gate or status_gate['alasan']})")
+        st.metric("Antrean", engine_stats["queue_depth"])
+        st.metric("Rata-rata Ukuran Batch", f"{engine_stats['avg_batch_size']:.2f}")
+        if "latency_ms" in engine_stats:
+            st.caption(f"Latensi p50/p99: {engine_stats['latency_ms']['p50']:.0f} / {engine_stats['latency_ms']['p99']:.0f} ms")
+        st.json(engine_stats["batch_size_histogram"])
+
+tampilkan_panel_waktu = st.sidebar.checkbox("🐞 Panel waktu (debug)")
+
+with st.sidebar.expander("🗂️ Cache Prediksi"):
+    cache_stats = prediction_cache.stats()
+    st.metric("Hit Rate", f"{cache_stats['hit_rate']*100:.1f}%")
+    st.caption(f"Hit memori: {cache_stats['hits']} · Hit disk: {cache_stats['disk_hits']} · Miss: {cache_stats['misses']}")
+    st.caption(f"Isi: {cache_stats['size']} / {cache_stats['capacity']} entri")
+    if "disk_size" in cache_stats:
+        st.caption(f"Disk: {cache_stats['disk_size']} / {cache_stats['disk_capacity']} entri "
+                   f"({cache_stats['disk_evictions']} dihapus)")
+    dedup_stats = duplicate_detector.stats()
+    st.caption(f"Gambar hampir sama dipakai ulang: {dedup_stats['hits']} "
+               f"(indeks {dedup_stats['indexed']} gambar, "
+               f"{dedup_stats['skipped']} terlalu polos untuk dibandingkan)")
 
 
 # ======================
@@ -223,10 +443,12 @@ if page == "🏠 Beranda":
     # --- Card 2: Statistik Singkat ---
     st.markdown('<div class="card">', unsafe_allow_html=True)
     st.markdown("<h3>📊 Statistik Singkat</h3>", unsafe_allow_html=True)
-    stat_col1, stat_col2, stat_col3 = st.columns(3)
-    stat_col1.metric("Jenis Penyakit", "6+1")
-    stat_col2.metric("Algoritma", "CNN Xception")
-    stat_col3.metric("Dataset", "Kaggle")
+    ringkasan = stats_aggregator.summary()
+    stat_col1, stat_col2, stat_col3, stat_col4 = st.columns(4)
+    stat_col1.metric("Total Deteksi", ringkasan["total"])
+    stat_col2.metric("Penyakit Terbanyak", ringkasan["label_terbanyak"] or "-")
+    stat_col3.metric("Model Ragu", f"{ringkasan['rasio_ragu']*100:.1f}%")
+    stat_col4.metric("Bukan Ikan", f"{ringkasan['rasio_bukan_ikan']*100:.1f}%")
     st.markdown('</div>', unsafe_allow_html=True)
 
     # --- Card 3: Tips Cepat ---
@@ -266,22 +488,72 @@ elif page == "🔍 Deteksi Penyakit":
         uploaded_file = st.file_uploader("Pilih atau seret gambar ikan ke sini", 
                                          type=["jpg", "jpeg", "png"])
 
+        # TTA hanya tersedia jika model dimuat di proses ini (bukan mode API)
+        mode_tta = st.toggle(
+            "Mode TTA untuk gambar sulit",
+            disabled=API_URL is not None,
+            help="Jika keyakinan di bawah ambang, beberapa variasi gambar (flip, crop, "
+                 "kecerahan) dianalisis sekaligus dan hasilnya dirata-rata.",
+        )
+        if mode_tta:
+            tta_col1, tta_col2 = st.columns(2)
+            tta_views = tta_col1.slider("Jumlah variasi", 2, MAKS_VIEWS, TTA_VIEWS)
+            tta_budget = tta_col2.slider("Anggaran waktu (ms)", 200, 5000, TTA_BUDGET_MS, step=100)
+
     if uploaded_file is not None:
-        img = Image.open(uploaded_file).convert('RGB')
+        trace = tracer.start()
+        # Decode draft: foto besar langsung diperkecil saat decode (sisi >= 1024 px)
+        with trace.stage("decode"):
+            img = load_image(uploaded_file, draft_size=PREVIEW_SIZE)
         with col1:
             st.image(img, caption="Gambar yang akan dideteksi", width=500) 
             
             if st.button("Deteksi Sekarang"):
+                if model_loader is not None and not model_loader.ready:
+                    with st.spinner('Menunggu model selesai dimuat...'):
+                        try:
+                            model_loader.wait()
+                        except RuntimeError as e:
+                            st.error(str(e))
+                            st.stop()
+                try:
+                    versi_model = get_model_version()
+                except RemoteError as e:
+                    st.error(f"🔴 Server inferensi tidak bisa dipakai: {e}")
+                    st.stop()
+
+                # Foto yang hampir sama dengan deteksi sebelumnya (oleh versi model
+                # yang sama) tidak perlu inferensi ulang
+                with trace.stage("dedup"):
+                    phash, duplikat, jarak = duplicate_detector.lookup(img, versi_model)
                 with st.spinner('Menganalisis gambar...'):
                     # Dapatkan semua probabilitas prediksi
-                    all_predictions = model_prediction(img)
+                    if duplikat is not None:
+                        all_predictions = np.asarray(duplikat["probabilities"], dtype=np.float32)
+                        st.caption(f"♻️ Mirip dengan deteksi {duplikat['waktu']:%d-%m-%Y %H:%M:%S} "
+                                   f"(jarak {jarak}); hasil sebelumnya dipakai ulang.")
+                    else:
+                        try:
+                            all_predictions = model_prediction(img, trace)
+                        except RemoteError as e:
+                            st.error(f"🔴 Server inferensi tidak bisa dipakai: {e}")
+                            st.stop()
                     
                     # Dapatkan kelas dan keyakinan tertinggi
-                    pred_class_idx = np.argmax(all_predictions)
-                    confidence = np.max(all_predictions)
-                    label = idx_to_class[pred_class_idx]
+                    label, confidence, status = interpret_prediction(all_predictions)
 
-                    AMBANG_BATAS = 0.70
+                    # Gambar sulit: ulangi dengan TTA dalam satu batch jika diaktifkan
+                    if mode_tta and confidence < AMBANG_BATAS:
+                        with trace.stage("tta"):
+                            all_predictions, views, tta_ms = get_tta_predictor().predict(
+                                img, n_views=tta_views, latency_budget_ms=tta_budget
+                            )
+                        label, confidence, status = interpret_prediction(all_predictions)
+                        # Hasil TTA tidak dipakai ulang untuk unggahan tanpa TTA
+                        versi_model = f"{versi_model}+tta"
+                        st.caption(f"🔁 TTA: {len(views)} variasi dalam {tta_ms:.0f} ms")
+
+                    stats_aggregator.record(label, confidence, status)
 
                     # 1. Cek PERTAMA: Apakah hasilnya adalah "bukan ikan"?
                     if label == "bukan ikan":
@@ -307,40 +579,57 @@ elif page == "🔍 Deteksi Penyakit":
                         with st.expander("🔬 **Lihat Detail dan Saran Penanganan**"):
                             st.markdown(saran)
 
-                        # --- Simpan riwayat ---
-                        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                        save_path = os.path.join(HISTORY_DIR, f"{timestamp}_{label}.jpg")
-                        img.save(save_path)
+                        # --- Simpan riwayat (duplikat tidak disimpan ulang) ---
+                        if duplikat is None:
+                            # Gambar polos tidak punya hash dan tidak ikut deduplikasi
+                            phash_simpan = to_signed(phash) if phash is not None else None
+                            with trace.stage("save"):
+                                try:
+                                    history_writer.submit(img, label, confidence, all_predictions,
+                                                          phash=phash_simpan, model_version=versi_model)
+                                except WriterBusy:
+                                    # Antrean penuh: simpan langsung agar riwayat tidak hilang
+                                    history_writer.write_now(img, label, confidence, all_predictions,
+                                                             phash=phash_simpan, model_version=versi_model)
                         
                         # --- Buat dan Tampilkan Grafik di kolom 2 ---
+                        # Diimpor di sini agar halaman lain tidak ikut membayar waktu impor
+                        import pandas as pd
+                        import plotly.express as px
+
                         # Buat DataFrame untuk grafik
-                        df = pd.DataFrame({
-                            'Penyakit': list(idx_to_class.values()),
-                            'Keyakinan': all_predictions * 100
-                        })
-                        df = df.sort_values(by='Keyakinan', ascending=True)
+                        with trace.stage("dataframe"):
+                            df = pd.DataFrame({
+                                'Penyakit': list(idx_to_class.values()),
+                                'Keyakinan': all_predictions * 100
+                            })
+                            df = df.sort_values(by='Keyakinan', ascending=True)
 
                         # Buat grafik bar horizontal dengan Plotly
-                        fig = px.bar(
-                            df,
-                            x='Keyakinan',
-                            y='Penyakit',
-                            orientation='h',
-                            title='Grafik Keyakinan Model',
-                            labels={'Keyakinan': 'Keyakinan (%)'},
-                            text=df['Keyakinan'].apply(lambda x: f'{x:.2f}%')
-                        )
-                        fig.update_layout(
-                            template='plotly_dark',
-                            xaxis_title="Keyakinan (%)",
-                            yaxis_title="",
-                            height=350
-                        )
-                        fig.update_traces(marker_color='#33FF8A') # Warna hijau agar serasi
+                        with trace.stage("chart"):
+                            fig = px.bar(
+                                df,
+                                x='Keyakinan',
+                                y='Penyakit',
+                                orientation='h',
+                                title='Grafik Keyakinan Model',
+                                labels={'Keyakinan': 'Keyakinan (%)'},
+                                text=df['Keyakinan'].apply(lambda x: f'{x:.2f}%')
+                            )
+                            fig.update_layout(
+                                template='plotly_dark',
+                                xaxis_title="Keyakinan (%)",
+                                yaxis_title="",
+                                height=350
+                            )
+                            fig.update_traces(marker_color='#33FF8A') # Warna hijau agar serasi
 
                         # Tampilkan di bawah tips
-                        col2.subheader("Distribusi Keyakinan")
-                        col2.plotly_chart(fig, use_container_width=True)
+                        with trace.stage("render_chart"):
+                            col2.subheader("Distribusi Keyakinan")
+                            col2.plotly_chart(fig, use_container_width=True)
+
+                    trace.finish()
 
     else:
         # Jika tidak ada file yang diunggah, tampilkan contoh (opsional)
@@ -348,6 +637,107 @@ elif page == "🔍 Deteksi Penyakit":
             st.divider()
             st.write("Belum ada gambar yang diunggah.")
 
+    if tampilkan_panel_waktu:
+        with st.expander("🐞 Waktu per Tahap", expanded=True):
+            if tracer.last_trace is not None:
+                st.markdown("**Deteksi terakhir (ms)**")
+                st.json(tracer.last_trace.as_dict())
+            ringkasan_waktu = tracer.snapshot()
+            if ringkasan_waktu:
+                st.markdown("**Histogram bergulir**")
+                st.dataframe([dict(tahap=tahap, **nilai) for tahap, nilai in ringkasan_waktu.items()],
+                             use_container_width=True)
+            else:
+                st.caption("Belum ada data waktu.")
+
+# ======================
+# ----- HALAMAN DETEKSI VIDEO -----
+# ======================
+elif page == "🎥 Deteksi Video":
+    st.title("🎥 Deteksi dari Video / Kamera")
+    st.info("Analisis rekaman atau kamera kolam. Hanya sebagian frame yang dianalisis, "
+            "lalu hasilnya dihaluskan menjadi satu putusan yang terus diperbarui.")
+
+    if API_URL:
+        st.warning("Mode video membutuhkan model yang dimuat di aplikasi ini (tidak tersedia dalam mode API).")
+        st.stop()
+
+    sumber_video = st.radio("Sumber", ["File video", "Kamera / URL stream"], horizontal=True)
+    if sumber_video == "File video":
+        video_file = st.file_uploader("Pilih file video", type=["mp4", "avi", "mov", "mkv"])
+        batas_detik = None
+    else:
+        video_file = None
+        alamat = st.text_input("Indeks kamera (0, 1, ...) atau URL rtsp/http", value="0")
+        batas_detik = st.slider("Durasi analisis (detik)", 10, 600, 60, step=10)
+
+    vcol1, vcol2 = st.columns(2)
+    sample_fps = vcol1.slider("Frame dianalisis per detik", 1, 15, VIDEO_SAMPLE_FPS)
+    smoothing = vcol2.slider("Bobot frame terbaru", 0.05, 1.0, VIDEO_SMOOTHING, step=0.05,
+                             help="Semakin kecil, putusan semakin stabil tetapi lebih lambat berubah.")
+
+    if st.button("Mulai Analisis", disabled=sumber_video == "File video" and video_file is None):
+        # OpenCV diimpor di sini agar halaman lain tidak ikut membayar waktu impor
+        import tempfile
+        from video_stream import FrameReader, VideoDetector, VideoSourceError
+
+        with st.spinner('Menunggu model selesai dimuat...'):
+            try:
+                backend = model_loader.wait()
+            except RuntimeError as e:
+                st.error(str(e))
+                st.stop()
+
+        # cv2.VideoCapture butuh path, jadi unggahan ditulis ke file sementara
+        path_sementara = None
+        if video_file is not None:
+            akhiran = os.path.splitext(video_file.name)[1]
+            with tempfile.NamedTemporaryFile(suffix=akhiran, delete=False) as tmp:
+                tmp.write(video_file.getbuffer())
+                path_sementara = tmp.name
+
+        frame_col, hasil_col = st.columns([3, 2])
+        tempat_frame = frame_col.empty()
+        tempat_putusan = hasil_col.empty()
+        tempat_metrik = hasil_col.empty()
+        progres = st.progress(0.0)
+
+        hasil = None
+        try:
+            with FrameReader(path_sementara or alamat, sample_fps) as reader:
+                # Model dipanggil langsung dengan batch frame (bukan lewat mesin batching)
+                detector = VideoDetector(backend.predict, smoothing=smoothing)
+                for hasil in detector.run(reader, max_seconds=batas_detik):
+                    tempat_frame.image(hasil["frame"], caption=f"Frame {hasil['waktu_ms'] / 1000:.1f} dtk "
+                                       f"· {hasil['frame_label']} ({hasil['frame_confidence'] * 100:.0f}%)")
+                    if hasil["status"] == STATUS_BUKAN_IKAN:
+                        tempat_putusan.error("❌ Tidak terdeteksi ikan")
+                    elif hasil["status"] == STATUS_RAGU:
+                        tempat_putusan.warning(f"⚠️ Model Ragu ({hasil['confidence'] * 100:.1f}%)")
+                    else:
+                        tempat_putusan.success(f"Putusan: **{hasil['label']}** ({hasil['confidence'] * 100:.1f}%)")
+                    tempat_metrik.caption(
+                        f"{hasil['fps']:.1f} frame/dtk diproses · {hasil['processed']} frame · "
+                        f"setiap {hasil['stride']} frame · dibuang {hasil['dropped']}"
+                    )
+                    if reader.total_frames:
+                        progres.progress(min(1.0, reader.read / reader.total_frames))
+                    elif batas_detik:
+                        progres.progress(min(1.0, hasil["waktu_ms"] / 1000 / batas_detik))
+        except VideoSourceError as e:
+            st.error(str(e))
+        finally:
+            if path_sementara:
+                os.remove(path_sementara)
+        progres.progress(1.0)
+
+        # Satu video dihitung sebagai satu deteksi di statistik, dengan putusan akhirnya
+        if hasil is not None:
+            stats_aggregator.record(hasil["label"], hasil["confidence"], hasil["status"])
+            st.success(f"Selesai: {hasil['processed']} frame dianalisis.")
+        else:
+            st.warning("Tidak ada frame yang bisa dibaca dari sumber ini.")
+
 # ======================
 # ----- HALAMAN EDUKASI -----
 # ======================
@@ -399,49 +789,147 @@ elif page == "📝 Riwayat":
     st.title("📝 Riwayat Deteksi")
     st.markdown("Berikut adalah riwayat gambar yang pernah Anda deteksi.")
 
-    try:
-        files = sorted(
-            [f for f in os.listdir(HISTORY_DIR) if f.endswith(('.jpg', '.png', '.jpeg'))],
-            reverse=True
-        )
-    except FileNotFoundError:
-        files = []
-
-    if not files:
+    JUMLAH_PER_HALAMAN = 12
+    JUMLAH_KOLOM = 4
+
+    writer_stats = history_writer.stats()
+    if writer_stats["pending"]:
+        st.caption(f"⏳ {writer_stats['pending']} deteksi sedang disimpan...")
+    if writer_stats["failed"]:
+        waktu_error, path_error, pesan_error = writer_stats["last_error"]
+        st.warning(f"{writer_stats['failed']} riwayat gagal disimpan. Terakhir: {path_error} ({pesan_error})")
+
+    # Pilihan tetap dari daftar kelas (riwayat hanya berisi deteksi valid)
+    pilihan_label = ["Semua"] + [label for label in class_labels if label != LABEL_BUKAN_IKAN]
+    filter_label = st.selectbox("Filter Hasil", pilihan_label)
+    filter_label = None if filter_label == "Semua" else filter_label
+
+    # Kembali ke halaman pertama setiap kali filter berubah
+    if st.session_state.get("riwayat_filter") != filter_label:
+        st.session_state["riwayat_filter"] = filter_label
+        st.session_state["riwayat_halaman"] = 0
+
+    total = history_store.count(label=filter_label)
+    jumlah_halaman = max(1, -(-total // JUMLAH_PER_HALAMAN))
+    halaman = min(st.session_state.get("riwayat_halaman", 0), jumlah_halaman - 1)
+
+    records = history_store.list(
+        limit=JUMLAH_PER_HALAMAN,
+        offset=halaman * JUMLAH_PER_HALAMAN,
+        label=filter_label,
+    )
+
+    if not records:
         st.info("Belum ada riwayat deteksi.")
     else:
-        JUMLAH_KOLOM = 4
+        nav_prev, nav_info, nav_next = st.columns([1, 2, 1])
+        if nav_prev.button("⬅️ Sebelumnya", disabled=halaman == 0):
+            st.session_state["riwayat_halaman"] = halaman - 1
+            st.rerun()
+        nav_info.markdown(
+            f"<center>Halaman {halaman + 1} dari {jumlah_halaman} · {total} deteksi</center>",
+            unsafe_allow_html=True,
+        )
+        if nav_next.button("Berikutnya ➡️", disabled=halaman >= jumlah_halaman - 1):
+            st.session_state["riwayat_halaman"] = halaman + 1
+            st.rerun()
+
         cols = st.columns(JUMLAH_KOLOM)
 
-        for i, file_name in enumerate(files):
+        for i, record in enumerate(records):
             with cols[i % JUMLAH_KOLOM]:
-                try:
-                    parts = file_name.split('_')
-                    timestamp_str = f"{parts[0]}_{parts[1]}"
-                    label_part = "_".join(parts[2:])
-                    label = os.path.splitext(label_part)[0]
-                    
-                    dt_object = datetime.strptime(timestamp_str, "%Y%m%d_%H%M%S")
-                    formatted_time = dt_object.strftime("%d %b %Y, %H:%M")
-                
-                except (ValueError, IndexError):
-                    label = os.path.splitext(file_name)[0]
-                    formatted_time = "Waktu tidak diketahui"
+                formatted_time = record["waktu"].strftime("%d %b %Y, %H:%M")
 
                 st.markdown(f'<div class="card">', unsafe_allow_html=True)
                 
-                image_path = os.path.join(HISTORY_DIR, file_name)
-                st.image(image_path, use_container_width=True)
+                image_path = record["image_path"]
+                thumb = ensure_thumbnail(image_path) if image_path else None
+                if thumb:
+                    st.image(thumb, use_container_width=True)
+                else:
+                    st.warning("File gambar tidak ditemukan.")
                 
-                st.markdown(f"**Hasil:** `{label}`")
+                st.markdown(f"**Hasil:** `{record['label']}`")
+                if record["confidence"] is not None:
+                    st.caption(f"Keyakinan: {record['confidence']*100:.2f}%")
                 st.caption(f"Waktu: {formatted_time}")
+
+                # Gambar resolusi penuh hanya dimuat jika diminta
+                kunci_penuh = f"penuh_{record['id']}"
+                if thumb and st.toggle("Lihat gambar penuh", key=kunci_penuh):
+                    st.image(image_path, use_container_width=True)
                 
-                if st.button("Hapus", key=file_name):
-                    os.remove(image_path)
+                if st.button("Hapus", key=f"hapus_{record['id']}"):
+                    history_store.delete(record["id"])
+                    duplicate_detector.remove(record["id"])
+                    if image_path:
+                        remove_thumbnail(image_path)
                     st.rerun() 
 
                 st.markdown(f'</div>', unsafe_allow_html=True)
 
+# ======================
+# ----- HALAMAN STATISTIK -----
+# ======================
+elif page == "📊 Statistik":
+    import pandas as pd
+    import plotly.express as px
+
+    st.title("📊 Statistik Deteksi")
+    st.markdown("Ringkasan seluruh deteksi yang pernah dilakukan di aplikasi ini.")
+
+    ringkasan = stats_aggregator.summary()
+    if not ringkasan["total"]:
+        st.info("Belum ada data deteksi.")
+    else:
+        m1, m2, m3, m4 = st.columns(4)
+        m1.metric("Total Deteksi", ringkasan["total"])
+        m2.metric("Hasil Valid", ringkasan["valid"])
+        m3.metric("Model Ragu", f"{ringkasan['rasio_ragu']*100:.1f}%")
+        m4.metric("Bukan Ikan", f"{ringkasan['rasio_bukan_ikan']*100:.1f}%")
+        if ringkasan["rata_keyakinan_valid"] is not None:
+            st.caption(f"Rata-rata keyakinan hasil valid: {ringkasan['rata_keyakinan_valid']*100:.2f}%")
+
+        st.divider()
+        periode = st.radio("Periode", ["Harian (30 hari)", "Mingguan (12 minggu)"], horizontal=True)
+        if periode.startswith("Harian"):
+            df_periode = pd.DataFrame(stats_aggregator.daily(days=30, status="valid"))
+            sumbu_x = "tanggal"
+        else:
+            df_periode = pd.DataFrame(stats_aggregator.weekly(weeks=12))
+            sumbu_x = "minggu"
+
+        if df_periode.empty:
+            st.info("Belum ada deteksi valid pada periode ini.")
+        else:
+            fig = px.bar(df_periode, x=sumbu_x, y="jumlah", color="label",
+                         title="Jumlah Deteksi per Penyakit", labels={"jumlah": "Jumlah", "label": "Penyakit"})
+            fig.update_layout(template='plotly_dark', height=400, xaxis_title="")
+            st.plotly_chart(fig, use_container_width=True)
+
+        col_kiri, col_kanan = st.columns(2)
+        with col_kiri:
+            df_status = pd.DataFrame(stats_aggregator.daily(days=30))
+            if not df_status.empty:
+                df_status = df_status.groupby(["tanggal", "status"], as_index=False)["jumlah"].sum()
+                df_status["rasio"] = df_status["jumlah"] / df_status.groupby("tanggal")["jumlah"].transform("sum") * 100
+                fig = px.line(df_status, x="tanggal", y="rasio", color="status", markers=True,
+                              title="Komposisi Hasil per Hari (%)", labels={"rasio": "%"})
+                fig.update_layout(template='plotly_dark', height=350, xaxis_title="")
+                st.plotly_chart(fig, use_container_width=True)
+        with col_kanan:
+            pilihan = ["Semua"] + sorted(idx_to_class.values())
+            label_hist = st.selectbox("Distribusi keyakinan untuk", pilihan)
+            df_hist = pd.DataFrame(stats_aggregator.confidence_histogram(
+                None if label_hist == "Semua" else label_hist
+            ))
+            fig = px.bar(df_hist, x="rentang", y="jumlah", title="Distribusi Keyakinan",
+                         labels={"rentang": "Keyakinan", "jumlah": "Jumlah"})
+            fig.add_vline(x=AMBANG_BATAS * 10 - 0.5, line_dash="dash", line_color="orange")
+            fig.update_layout(template='plotly_dark', height=350)
+            fig.update_traces(marker_color='#33FF8A')
+            st.plotly_chart(fig, use_container_width=True)
+
 # ======================
 # ----- HALAMAN TENTANG -----
 # ======================
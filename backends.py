@@ -0,0 +1,192 @@
+# ======================
+# Backend Runtime Inferensi
+# ======================
+# Model yang sama bisa dijalankan dengan beberapa runtime. convert_model.py
+# menghasilkan artefak yang sudah dioptimasi (ONNX, TFLite float16 / int8
+# dynamic-range); modul ini memilih runtime tercepat yang tersedia, dan
+# kembali ke Keras + model999.h5 jika tidak ada.
+#
+# Semua backend punya antarmuka yang sama:
+#   backend.predict(batch)  # batch float32 (N, 299, 299, 3) -> (N, kelas)
+#
+# Pilihan bisa dipaksa lewat variabel lingkungan IKANCHECK_BACKEND
+# (keras / tflite-dynamic / tflite-fp16 / onnx / auto).
+import json
+import os
+import threading
+
+import numpy as np
+
+from config import EXPORT_REPORT, MODEL_ARTIFACTS, MODEL_PATH
+
+# Urutan preferensi mode "auto": paling cepat di CPU lebih dulu
+URUTAN_AUTO = ["onnx", "tflite-dynamic", "tflite-fp16", "keras"]
+# Format di MODEL_ARTIFACTS yang bisa dijalankan modul ini (savedmodel hanya untuk TF Serving)
+BACKEND_RUNTIME = ("keras", "tflite-fp16", "tflite-dynamic", "onnx")
+
+# Batch TFLite dibulatkan ke atas ke salah satu ukuran ini (sisanya diisi
+# padding), dengan satu interpreter per ukuran. Mesin batching menghasilkan
+# ukuran batch yang berganti-ganti; tanpa ini setiap pergantian memicu
+# resize_tensor_input + allocate_tensors atas seluruh Xception.
+UKURAN_BATCH_TFLITE = (1, 2, 4, 8, 16)
+
+
+class BackendUnavailable(RuntimeError):
+    pass
+
+
+class KerasBackend:
+    name = "keras"
+
+    def __init__(self, path=MODEL_PATH, num_threads=None):
+        import tensorflow as tf
+        if num_threads:
+            # Hanya berlaku jika runtime TF belum diinisialisasi di proses ini
+            try:
+                tf.config.threading.set_intra_op_parallelism_threads(num_threads)
+                tf.config.threading.set_inter_op_parallelism_threads(1)
+            except RuntimeError:
+                pass
+        from tensorflow.keras.models import load_model
+        self.path = path
+        self.model = load_model(path)
+
+    def predict(self, batch):
+        return np.asarray(self.model.predict_on_batch(batch))
+
+
+class _TFLiteSlot:
+    # Satu interpreter dengan ukuran batch tetap, beserta buffer padding-nya
+    def __init__(self, Interpreter, path, num_threads, batch_size):
+        self.interpreter = Interpreter(model_path=path, num_threads=num_threads)
+        masukan = self.interpreter.get_input_details()[0]
+        self.input = masukan["index"]
+        self.output = self.interpreter.get_output_details()[0]["index"]
+        shape = [batch_size] + list(masukan["shape"][1:])
+        self.interpreter.resize_tensor_input(self.input, shape)
+        self.interpreter.allocate_tensors()
+        self.padded = np.zeros(shape, dtype=np.float32)
+        # Interpreter TFLite tidak aman dipakai beberapa thread sekaligus
+        self.lock = threading.Lock()
+
+
+class TFLiteBackend:
+    def __init__(self, path, num_threads=None, name="tflite"):
+        self._Interpreter = _tflite_interpreter_class()
+        self.name = name
+        self.path = path
+        self.num_threads = num_threads
+        self._slots = {}
+        self._lock = threading.Lock()
+        self._slot(1)  # gagal lebih awal jika file model tidak valid
+
+    def _slot(self, batch_size):
+        # Interpreter dibuat saat ukuran itu pertama kali dipakai; bobot
+        # di-mmap dari file yang sama, jadi tambahan memori hanya aktivasi
+        with self._lock:
+            slot = self._slots.get(batch_size)
+            if slot is None:
+                slot = self._slots[batch_size] = _TFLiteSlot(
+                    self._Interpreter, self.path, self.num_threads, batch_size)
+            return slot
+
+    def predict(self, batch):
+        batch = np.asarray(batch, dtype=np.float32)
+        n = batch.shape[0]
+        terbesar = UKURAN_BATCH_TFLITE[-1]
+        if n > terbesar:
+            return np.concatenate([self.predict(batch[i:i + terbesar]) for i in range(0, n, terbesar)])
+
+        ukuran = next(u for u in UKURAN_BATCH_TFLITE if u >= n)
+        slot = self._slot(ukuran)
+        with slot.lock:
+            if n == ukuran:
+                slot.interpreter.set_tensor(slot.input, np.ascontiguousarray(batch))
+            else:
+                slot.padded[:n] = batch
+                slot.interpreter.set_tensor(slot.input, slot.padded)
+            slot.interpreter.invoke()
+            return slot.interpreter.get_tensor(slot.output)[:n].copy()
+
+
+class OnnxBackend:
+    name = "onnx"
+
+    def __init__(self, path, num_threads=None):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise BackendUnavailable("onnxruntime tidak terpasang") from e
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+            options.inter_op_num_threads = 1
+        self.path = path
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self._input = self.session.get_inputs()[0].name
+
+    def predict(self, batch):
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        return self.session.run(None, {self._input: batch})[0]
+
+
+def _tflite_interpreter_class():
+    # Runtime ringan lebih dulu; TensorFlow penuh sebagai cadangan
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+    try:
+        from tflite_runtime.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        pass
+    try:
+        import tensorflow as tf
+        return tf.lite.Interpreter
+    except ImportError as e:
+        raise BackendUnavailable("Tidak ada runtime TFLite yang terpasang") from e
+
+
+def create_backend(name, num_threads=None):
+    if name not in BACKEND_RUNTIME:
+        raise ValueError(f"Backend tidak dikenal: {name} (pilihan: {', '.join(BACKEND_RUNTIME)})")
+    if name == "keras":
+        return KerasBackend(MODEL_PATH, num_threads)
+    path = MODEL_ARTIFACTS[name]
+    if not os.path.exists(path):
+        raise BackendUnavailable(f"Artefak {path} belum dibuat (jalankan convert_model.py)")
+    if name == "onnx":
+        return OnnxBackend(path, num_threads)
+    return TFLiteBackend(path, num_threads, name=name)
+
+
+def _lolos_paritas(name):
+    # Hanya artefak dengan catatan uji paritas yang lolos di convert_model.py
+    # yang dipilih otomatis; tanpa catatan berarti belum pernah diperiksa
+    if name == "keras":
+        return True
+    try:
+        with open(EXPORT_REPORT, encoding='utf-8') as f:
+            laporan = json.load(f)
+    except (OSError, ValueError):
+        return False
+    paritas = laporan.get("paritas", {}).get(name)
+    return bool(paritas and paritas.get("lolos", False))
+
+
+def load_backend(preferred=None, num_threads=None):
+    preferred = preferred or os.environ.get("IKANCHECK_BACKEND", "auto")
+    if preferred != "auto":
+        return create_backend(preferred, num_threads)
+
+    for name in URUTAN_AUTO:
+        if not _lolos_paritas(name):
+            continue
+        try:
+            return create_backend(name, num_threads)
+        except BackendUnavailable:
+            continue
+    raise BackendUnavailable("Tidak ada backend inferensi yang bisa dimuat")
@@ -0,0 +1,365 @@
+# ======================
+# Diagnosis Massal dari Baris Perintah
+# ======================
+# Menjalankan model pada seluruh gambar di sebuah folder (mis. hasil kamera
+# kolam satu hari) tanpa membuka Streamlit.
+#
+# Contoh:
+#   python batch_diagnosis.py /data/kamera/20250920 -o hasil_20250920.csv
+#   python batch_diagnosis.py /data/kamera/20250920 -o hasil.jsonl --batch-size 64
+#   python batch_diagnosis.py /data/kamera/20250920 --processes auto
+#
+# Hasil ditulis per batch dan langsung di-flush, sehingga jika proses mati di
+# tengah jalan, menjalankan ulang perintah yang sama akan melewati gambar yang
+# sudah tercatat di file output.
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from config import EKSTENSI_GAMBAR, HISTORY_CSV_FIELDS, idx_to_class, interpret_prediction
+from preprocessing import BatchBuffer, decode_resized
+
+STATUS_GAGAL = "gagal"
+CSV_FIELDS = HISTORY_CSV_FIELDS + ["status"]
+
+
+# ======================
+# Sumber Gambar (generator)
+# ======================
+def iter_images(root, recursive=True):
+    # Menelusuri folder secara streaming; tidak pernah menampung seluruh daftar file
+    stack = [root]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError as e:
+            print(f"Peringatan: tidak bisa membaca folder {current}: {e}", file=sys.stderr)
+            continue
+        subdirs = []
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if recursive:
+                    subdirs.append(entry.path)
+            elif entry.name.lower().endswith(EKSTENSI_GAMBAR):
+                yield os.path.relpath(entry.path, root)
+        stack.extend(reversed(subdirs))
+
+
+def _decode(root, rel_path):
+    try:
+        # Pekerja hanya menghasilkan array uint8 kecil; normalisasi dilakukan
+        # langsung ke buffer batch oleh konsumen.
+        return rel_path, decode_resized(os.path.join(root, rel_path)), None
+    except Exception as e:
+        return rel_path, None, e
+
+
+def iter_decoded_parallel(root, paths, executor, prefetch):
+    # Decode + resize di thread pool, dengan jumlah pekerjaan yang menunggu dibatasi
+    # agar memori tetap konstan berapapun banyaknya gambar.
+    pending = deque()
+    for rel_path in paths:
+        pending.append(executor.submit(_decode, root, rel_path))
+        if len(pending) >= prefetch:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def iter_batches(decoded, batch_size):
+    batch = []
+    for item in decoded:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# ======================
+# Output (CSV / JSONL)
+# ======================
+def detect_format(output_path, fmt=None):
+    if fmt:
+        return fmt
+    return "jsonl" if output_path.lower().endswith((".jsonl", ".ndjson")) else "csv"
+
+
+def load_done(output_path, fmt):
+    # (nama file yang sudah ada di output, jumlah baris "gagal"), untuk
+    # melanjutkan proses yang terputus. Baris "gagal" tidak dihitung selesai,
+    # jadi dicoba lagi saat dilanjutkan (mis. error I/O sesaat atau pointer
+    # LFS yang belum di-pull).
+    if not os.path.exists(output_path):
+        return set(), 0
+    done = set()
+    gagal = 0
+    with open(output_path, newline='', encoding='utf-8') as f:
+        if fmt == "csv":
+            for row in csv.DictReader(f):
+                if row.get("status") == STATUS_GAGAL:
+                    gagal += 1
+                elif row.get("filename"):
+                    done.add(row["filename"])
+        else:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    row = json.loads(line)
+                    if row.get("status") == STATUS_GAGAL:
+                        gagal += 1
+                    else:
+                        done.add(row["filename"])
+                except (ValueError, KeyError):
+                    # Baris terakhir bisa terpotong jika proses mati saat menulis
+                    continue
+    return done, gagal
+
+
+def drop_failed_rows(output_path, fmt):
+    # Tulis ulang output tanpa baris "gagal" sebelum dicoba lagi, agar tetap
+    # satu baris per nama file. File sementara + os.replace: output lama
+    # utuh jika proses mati di tengah jalan.
+    sementara = output_path + ".tmp"
+    with open(output_path, newline='', encoding='utf-8') as src, \
+            open(sementara, "w", newline='', encoding='utf-8') as dst:
+        if fmt == "csv":
+            reader = csv.DictReader(src)
+            writer = csv.DictWriter(dst, fieldnames=reader.fieldnames or CSV_FIELDS)
+            writer.writeheader()
+            for row in reader:
+                if row.get("status") != STATUS_GAGAL:
+                    writer.writerow(row)
+        else:
+            for line in src:
+                try:
+                    if json.loads(line).get("status") == STATUS_GAGAL:
+                        continue
+                except ValueError:
+                    # Baris terpotong dibuang; nama filenya diproses ulang
+                    continue
+                dst.write(line if line.endswith("\n") else line + "\n")
+        dst.flush()
+        os.fsync(dst.fileno())
+    os.replace(sementara, output_path)
+
+
+def _repair_last_line(output_path):
+    # Jika proses mati saat menulis, baris terakhir tidak diakhiri newline;
+    # tambahkan agar baris berikutnya tidak menempel ke baris yang terpotong.
+    with open(output_path, "rb+") as f:
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b"\n":
+            f.write(b"\n")
+
+
+class ResultWriter:
+    def __init__(self, output_path, fmt, with_probabilities=False):
+        self.fmt = fmt
+        self.with_probabilities = with_probabilities
+        baru = not os.path.exists(output_path) or os.path.getsize(output_path) == 0
+        if not baru:
+            _repair_last_line(output_path)
+        self._file = open(output_path, "a", newline='', encoding='utf-8')
+        if fmt == "csv":
+            self._csv = csv.DictWriter(self._file, fieldnames=CSV_FIELDS)
+            if baru:
+                self._csv.writeheader()
+
+    def write(self, row, probabilities=None):
+        if self.fmt == "csv":
+            self._csv.writerow(row)
+        else:
+            if self.with_probabilities and probabilities is not None:
+                row = dict(row, probabilities={
+                    idx_to_class[i]: round(float(p), 6) for i, p in enumerate(probabilities)
+                })
+            self._file.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+    def flush(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+
+# ======================
+# Proses Utama
+# ======================
+def local_predictor(backend, batch_size):
+    # Mode satu proses: array uint8 dinormalisasi ke satu buffer batch yang dipakai ulang
+    buffer = BatchBuffer(batch_size)
+
+    def predict_arrays(arrays):
+        for i, arr in enumerate(arrays):
+            buffer.put(i, arr)
+        return backend.predict(buffer.view(len(arrays)))
+
+    return predict_arrays
+
+
+def run(input_dir, output_path, predict_arrays, batch_size=32, workers=None, fmt=None,
+        resume=True, recursive=True, with_probabilities=False, log_every=500, inflight=1):
+    # predict_arrays: daftar array uint8 (H, W, 3) -> probabilitas (N, kelas).
+    # inflight > 1 hanya untuk predictor yang aman dipanggil paralel (mode multi-proses).
+    fmt = detect_format(output_path, fmt)
+    done, gagal = load_done(output_path, fmt) if resume else (set(), 0)
+    if gagal:
+        print(f"Mencoba lagi {gagal} gambar yang sebelumnya gagal dibaca.", file=sys.stderr)
+        drop_failed_rows(output_path, fmt)
+    if done:
+        print(f"Melanjutkan: {len(done)} gambar sudah diproses sebelumnya.", file=sys.stderr)
+
+    workers = workers or os.cpu_count() or 1
+    paths = (p for p in iter_images(input_dir, recursive) if p not in done)
+    writer = ResultWriter(output_path, fmt, with_probabilities)
+
+    jumlah = {"total": 0, STATUS_GAGAL: 0}
+    t_mulai = time.perf_counter()
+    terakhir_log = 0
+
+    def tulis(batch, preds):
+        nonlocal terakhir_log
+        waktu = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        ok = [p for p, _, err in batch if err is None]
+        for rel_path, probabilities in zip(ok, preds):
+            label, confidence, status = interpret_prediction(probabilities)
+            writer.write({
+                "waktu": waktu,
+                "prediksi": label,
+                "confidence": round(confidence, 4),
+                "filename": rel_path,
+                "status": status,
+            }, probabilities)
+            jumlah[status] = jumlah.get(status, 0) + 1
+
+        for rel_path, _, err in batch:
+            if err is None:
+                continue
+            print(f"Gagal membaca {rel_path}: {err}", file=sys.stderr)
+            writer.write({"waktu": waktu, "prediksi": "", "confidence": "",
+                          "filename": rel_path, "status": STATUS_GAGAL})
+            jumlah[STATUS_GAGAL] += 1
+
+        # Flush per batch: titik lanjut jika proses terhenti
+        writer.flush()
+        jumlah["total"] += len(batch)
+        if jumlah["total"] - terakhir_log >= log_every:
+            terakhir_log = jumlah["total"]
+            laju = jumlah["total"] / (time.perf_counter() - t_mulai)
+            print(f"{jumlah['total']} gambar diproses ({laju:.1f} gambar/detik)", file=sys.stderr)
+
+    def prediksi(batch):
+        arrays = [x for _, x, err in batch if err is None]
+        return predict_arrays(arrays) if arrays else []
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="decode") as executor, \
+                ThreadPoolExecutor(max_workers=inflight, thread_name_prefix="predict") as predictor:
+            decoded = iter_decoded_parallel(input_dir, paths, executor, prefetch=batch_size * (inflight + 1))
+            # Hasil ditulis berurutan; paling banyak `inflight` batch sedang diprediksi
+            pending = deque()
+            for batch in iter_batches(decoded, batch_size):
+                pending.append((batch, predictor.submit(prediksi, batch)))
+                if len(pending) >= inflight:
+                    selesai, future = pending.popleft()
+                    tulis(selesai, future.result())
+            while pending:
+                selesai, future = pending.popleft()
+                tulis(selesai, future.result())
+    finally:
+        writer.close()
+
+    durasi = time.perf_counter() - t_mulai
+    jumlah["detik"] = round(durasi, 2)
+    jumlah["gambar_per_detik"] = round(jumlah["total"] / durasi, 2) if durasi > 0 else 0.0
+    return jumlah
+
+
+def _sample_arrays(input_dir, n):
+    # Beberapa gambar pertama dari folder input, untuk kalibrasi jumlah pekerja
+    arrays = []
+    for rel_path in iter_images(input_dir):
+        try:
+            arrays.append(decode_resized(os.path.join(input_dir, rel_path)))
+        except OSError:
+            continue
+        if len(arrays) >= n:
+            break
+    return arrays
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Deteksi penyakit ikan untuk seluruh gambar dalam satu folder.")
+    parser.add_argument("input_dir", help="Folder berisi gambar ikan (jpg/jpeg/png)")
+    parser.add_argument("-o", "--output", default="hasil_deteksi.csv",
+                        help="File hasil (.csv atau .jsonl). Default: hasil_deteksi.csv")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="Paksa format output")
+    parser.add_argument("--backend", default=None,
+                        help="keras / tflite-dynamic / tflite-fp16 / onnx / auto. Default: auto")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Jumlah thread decode/resize. Default: jumlah core CPU")
+    parser.add_argument("--processes", default=None,
+                        help="Jalankan inferensi di N proses pekerja (masing-masing memuat model), "
+                             "atau 'auto' untuk memilih N dari jumlah core dan throughput terukur")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="Proses ulang semua gambar walaupun sudah ada di output")
+    parser.add_argument("--no-recursive", action="store_true", help="Jangan masuk ke subfolder")
+    parser.add_argument("--probabilities", action="store_true",
+                        help="Sertakan seluruh vektor probabilitas (hanya untuk JSONL)")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.input_dir):
+        parser.error(f"Folder tidak ditemukan: {args.input_dir}")
+
+    pool = None
+    if args.processes:
+        from process_pool import ProcessPoolInference, auto_configure
+        if args.processes == "auto":
+            pool, laju = auto_configure(
+                _sample_arrays(args.input_dir, args.batch_size), args.batch_size, args.backend,
+                log=lambda pesan: print(pesan, file=sys.stderr),
+            )
+        else:
+            pool = ProcessPoolInference(int(args.processes), args.batch_size, args.backend)
+        print(f"Mode multi-proses: {pool.n_workers} pekerja x {pool.threads_per_worker} thread",
+              file=sys.stderr)
+        predict_arrays, inflight = pool.predict_arrays, pool.n_workers
+    else:
+        from backends import load_backend
+        predict_arrays, inflight = local_predictor(load_backend(args.backend), args.batch_size), 1
+
+    try:
+        jumlah = run(
+            args.input_dir, args.output, predict_arrays,
+            batch_size=args.batch_size,
+            workers=args.workers,
+            fmt=args.format,
+            resume=not args.no_resume,
+            recursive=not args.no_recursive,
+            with_probabilities=args.probabilities,
+            inflight=inflight,
+        )
+    finally:
+        if pool is not None:
+            pool.close()
+    print(json.dumps(jumlah, ensure_ascii=False), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,296 @@
+# ======================
+# Benchmark Inferensi
+# ======================
+# Mengukur jalur deteksi yang sebenarnya, per tahap:
+#   decode     : membuka & decode gambar (dengan draft JPEG)
+#   preprocess : resize + normalisasi ke float32
+#   predict    : forward pass model (per batch)
+#   chart      : DataFrame + grafik Plotly seperti di halaman Deteksi
+# atas gambar di image/ dan riwayat_upload/ serta gambar sintetis beberapa
+# resolusi, untuk kombinasi backend x ukuran batch x jumlah thread.
+#
+# Setiap kombinasi backend/thread dijalankan di proses terpisah supaya
+# pengaturan thread runtime dan puncak RSS tidak saling memengaruhi.
+# Hasil ditulis sebagai JSON agar bisa dibandingkan antar versi model/backend:
+#   python benchmark.py --backends keras tflite-dynamic --batch-sizes 1 8 16
+#   python benchmark.py --compare benchmark_results/a.json benchmark_results/b.json
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+from config import FOLDER_HASIL, IMG_SIZE, idx_to_class
+from preprocessing import BatchBuffer, list_images, load_image, resize_to_array, synthetic_jpeg
+
+RESOLUSI_SINTETIS = [(640, 480), (1920, 1080), (4000, 3000)]
+
+
+def percentiles(values_ms):
+    if not values_ms:
+        return {}
+    arr = np.asarray(values_ms)
+    return {
+        "n": int(arr.size),
+        "mean": round(float(arr.mean()), 3),
+        "p50": round(float(np.percentile(arr, 50)), 3),
+        "p95": round(float(np.percentile(arr, 95)), 3),
+        "p99": round(float(np.percentile(arr, 99)), 3),
+    }
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux melaporkan KiB, macOS byte
+    return round(rss / (2**20 if sys.platform == "darwin" else 2**10), 1)
+
+
+# ======================
+# Input
+# ======================
+def collect_inputs(max_real=64):
+    # Daftar (nama, bytes). File yang masih pointer Git LFS dilewati saat decode.
+    inputs = []
+    for path in list_images()[:max_real]:
+        with open(path, "rb") as f:
+            inputs.append((path, f.read()))
+    for width, height in RESOLUSI_SINTETIS:
+        inputs.append((f"sintetis_{width}x{height}", synthetic_jpeg(width, height)))
+    return inputs
+
+
+# ======================
+# Tahap decode + preprocess (tidak bergantung backend)
+# ======================
+def bench_preprocess(inputs, repeat=3):
+    decode_ms, preprocess_ms, per_input = [], [], {}
+    arrays = []
+    buffer = BatchBuffer(1)
+    for nama, data in inputs:
+        d_ms, p_ms = [], []
+        for _ in range(repeat):
+            try:
+                t0 = time.perf_counter()
+                img = load_image(io.BytesIO(data))
+                t1 = time.perf_counter()
+                arr = resize_to_array(img)
+                buffer.put(0, arr)
+                t2 = time.perf_counter()
+            except OSError:
+                break
+            d_ms.append((t1 - t0) * 1000)
+            p_ms.append((t2 - t1) * 1000)
+        if not d_ms:
+            continue
+        arrays.append(arr)
+        decode_ms += d_ms
+        preprocess_ms += p_ms
+        per_input[nama] = {"decode_ms": round(min(d_ms), 3), "preprocess_ms": round(min(p_ms), 3)}
+    return {
+        "decode_ms": percentiles(decode_ms),
+        "preprocess_ms": percentiles(preprocess_ms),
+        "per_input": per_input,
+    }, arrays
+
+
+# ======================
+# Tahap predict + chart (per backend/thread, di proses anak)
+# ======================
+def bench_chart(probabilities, repeat=20):
+    try:
+        import pandas as pd
+        import plotly.express as px
+    except ImportError:
+        return None
+    durasi = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        df = pd.DataFrame({'Penyakit': list(idx_to_class.values()), 'Keyakinan': probabilities * 100})
+        df = df.sort_values(by='Keyakinan', ascending=True)
+        fig = px.bar(df, x='Keyakinan', y='Penyakit', orientation='h',
+                     text=df['Keyakinan'].apply(lambda x: f'{x:.2f}%'))
+        fig.update_layout(template='plotly_dark', height=350)
+        fig.to_plotly_json()
+        durasi.append((time.perf_counter() - t0) * 1000)
+    return percentiles(durasi)
+
+
+def _run_backend(backend_name, threads, batch_sizes, arrays, iterations, warmup, result_queue):
+    try:
+        from backends import load_backend
+
+        t0 = time.perf_counter()
+        backend = load_backend(backend_name, num_threads=threads)
+        load_s = time.perf_counter() - t0
+        rss_setelah_load = peak_rss_mb()
+
+        hasil = {"backend": backend.name, "threads": threads, "load_s": round(load_s, 3),
+                 "rss_setelah_load_mb": rss_setelah_load, "batch": []}
+
+        buffer = BatchBuffer(max(batch_sizes))
+        for i in range(buffer.capacity):
+            buffer.put(i, arrays[i % len(arrays)])
+
+        preds = None
+        for bs in batch_sizes:
+            batch = buffer.view(bs)
+            for _ in range(warmup):
+                backend.predict(batch)
+            latensi = []
+            t_mulai = time.perf_counter()
+            for _ in range(iterations):
+                t0 = time.perf_counter()
+                preds = backend.predict(batch)
+                latensi.append((time.perf_counter() - t0) * 1000)
+            total = time.perf_counter() - t_mulai
+            hasil["batch"].append({
+                "batch_size": bs,
+                "latensi_batch_ms": percentiles(latensi),
+                "latensi_per_gambar_ms": round(float(np.median(latensi)) / bs, 3),
+                "gambar_per_detik": round(bs * iterations / total, 2),
+            })
+
+        hasil["chart_ms"] = bench_chart(np.asarray(preds[0]))
+        hasil["puncak_rss_mb"] = peak_rss_mb()
+        result_queue.put(hasil)
+    except Exception as e:
+        result_queue.put({"backend": backend_name, "threads": threads, "error": repr(e)})
+
+
+def bench_backend(backend_name, threads, batch_sizes, arrays, iterations, warmup):
+    ctx = multiprocessing.get_context("spawn")
+    result_queue = ctx.Queue()
+    proc = ctx.Process(
+        target=_run_backend,
+        args=(backend_name, threads, batch_sizes, arrays, iterations, warmup, result_queue),
+    )
+    proc.start()
+    while True:
+        try:
+            hasil = result_queue.get(timeout=1.0)
+            break
+        except queue.Empty:
+            if not proc.is_alive():
+                hasil = {"backend": backend_name, "threads": threads,
+                         "error": f"proses benchmark berhenti dengan kode {proc.exitcode}"}
+                break
+    proc.join()
+    return hasil
+
+
+# ======================
+# Laporan
+# ======================
+def metadata():
+    from prediction_cache import model_version
+    from config import MODEL_PATH
+    try:
+        versi = model_version(MODEL_PATH)
+    except OSError:
+        versi = None
+    return {
+        "waktu": datetime.now().isoformat(timespec="seconds"),
+        "host": platform.node(),
+        "cpu": os.cpu_count(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "model_version": versi,
+        "input_size": list(IMG_SIZE),
+    }
+
+
+def compare(path_a, path_b):
+    with open(path_a, encoding='utf-8') as f:
+        a = json.load(f)
+    with open(path_b, encoding='utf-8') as f:
+        b = json.load(f)
+
+    def index(laporan):
+        baris = {}
+        for run in laporan.get("inferensi", []):
+            for item in run.get("batch", []):
+                baris[(run["backend"], run["threads"], item["batch_size"])] = item
+        return baris
+
+    ia, ib = index(a), index(b)
+    print(f"{'backend':<16}{'thr':>4}{'bs':>4}{'p50 A':>10}{'p50 B':>10}{'img/s A':>10}{'img/s B':>10}{'Δ img/s':>9}")
+    for key in sorted(set(ia) & set(ib), key=str):
+        ra, rb = ia[key], ib[key]
+        ta, tb = ra["gambar_per_detik"], rb["gambar_per_detik"]
+        delta = (tb - ta) / ta * 100 if ta else 0.0
+        print(f"{key[0]:<16}{str(key[1]):>4}{key[2]:>4}"
+              f"{ra['latensi_batch_ms']['p50']:>10.1f}{rb['latensi_batch_ms']['p50']:>10.1f}"
+              f"{ta:>10.1f}{tb:>10.1f}{delta:>8.1f}%")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark latensi & throughput deteksi penyakit ikan.")
+    parser.add_argument("--backends", nargs="+", default=["auto"],
+                        help="keras / tflite-dynamic / tflite-fp16 / onnx / auto")
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 4, 8, 16])
+    parser.add_argument("--threads", nargs="+", type=int, default=None,
+                        help="Jumlah thread intra-op. Default: 1, setengah core, semua core")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--max-real", type=int, default=64, help="Jumlah maksimum gambar asli")
+    parser.add_argument("--skip-inference", action="store_true", help="Hanya ukur decode/preprocess")
+    parser.add_argument("--label", default="", help="Label bebas untuk nama file hasil")
+    parser.add_argument("-o", "--output", help="File JSON hasil. Default: benchmark_results/<waktu>.json")
+    parser.add_argument("--compare", nargs=2, metavar=("A", "B"), help="Bandingkan dua file hasil")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    cpu = os.cpu_count() or 1
+    threads = args.threads or sorted({1, max(1, cpu // 2), cpu})
+
+    inputs = collect_inputs(args.max_real)
+    print(f"Mengukur decode/preprocess untuk {len(inputs)} input...", file=sys.stderr)
+    pre, arrays = bench_preprocess(inputs)
+    laporan = {"meta": metadata(), "praproses": pre, "inferensi": []}
+
+    if not args.skip_inference and arrays:
+        for backend_name in args.backends:
+            for n in threads:
+                print(f"Mengukur backend={backend_name} threads={n}...", file=sys.stderr)
+                laporan["inferensi"].append(bench_backend(
+                    backend_name, n, args.batch_sizes, arrays, args.iterations, args.warmup,
+                ))
+
+    output = args.output
+    if not output:
+        os.makedirs(FOLDER_HASIL, exist_ok=True)
+        nama = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output = os.path.join(FOLDER_HASIL, f"{nama}{'_' + args.label if args.label else ''}.json")
+    with open(output, "w", encoding='utf-8') as f:
+        json.dump(laporan, f, indent=2, ensure_ascii=False)
+
+    print(json.dumps({"praproses": {k: pre[k] for k in ("decode_ms", "preprocess_ms")}}, indent=2))
+    for run in laporan["inferensi"]:
+        if "error" in run:
+            print(f"{run['backend']} threads={run['threads']}: GAGAL {run['error']}")
+            continue
+        for item in run["batch"]:
+            lat = item["latensi_batch_ms"]
+            print(f"{run['backend']:<16} threads={run['threads']:<3} bs={item['batch_size']:<3} "
+                  f"p50={lat['p50']:.1f}ms p95={lat['p95']:.1f}ms p99={lat['p99']:.1f}ms "
+                  f"{item['gambar_per_detik']:.1f} gambar/detik  RSS={run['puncak_rss_mb']} MB")
+    print(f"Hasil ditulis ke {output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+# ======================
+# Konfigurasi Bersama
+# ======================
+# Dipakai oleh app.py dan alat baris perintah agar label kelas, ambang
+# keyakinan, dan ukuran input model selalu sama di semua jalur deteksi.
+MODEL_PATH = "model999.h5"
+
+# Artefak hasil convert_model.py dan laporan uji paritasnya
+MODEL_ARTIFACTS = {
+    "keras": "model999.keras",
+    "savedmodel": "model999_savedmodel",
+    "tflite-fp16": "model999_fp16.tflite",
+    "tflite-dynamic": "model999_dynamic.tflite",
+    "onnx": "model999.onnx",
+}
+EXPORT_REPORT = "model_export.json"
+IMG_SIZE = (299, 299)
+
+# Ekstensi file gambar yang dikenali semua alat
+EKSTENSI_GAMBAR = ('.jpg', '.jpeg', '.png')
+
+# Folder gambar contoh untuk uji paritas, benchmark, dan pelatihan gerbang,
+# serta folder tempat hasil benchmark ditulis
+FOLDER_SAMPEL = ["image", "riwayat_upload"]
+FOLDER_HASIL = "benchmark_results"
+
+class_labels = {
+    "Bacterial Red disease": 0,
+    "Bacterial diseases - Aeromoniasis": 1,
+    "Bacterial gill disease": 2,
+    "Fungal diseases Saprolegniasis": 3,
+    "Healthy Fish": 4,
+    "Parasitic diseases": 5,
+    "Viral diseases White tail disease": 6,
+    "bukan ikan": 7
+}
+idx_to_class = {v: k for k, v in class_labels.items()}
+
+LABEL_BUKAN_IKAN = "bukan ikan"
+
+# Di bawah ambang ini model dianggap ragu dan hasil tidak ditampilkan
+AMBANG_BATAS = 0.70
+
+# Gerbang "bukan ikan": blok awal Xception + regresi logistik kecil (dilatih
+# dengan fish_gate.py). Gambar ditolak tanpa model penuh jika
+# p(bukan ikan) >= FISH_GATE_THRESHOLD; gerbang nonaktif jika file tidak ada.
+FISH_GATE_PATH = "fish_gate.npz"
+FISH_GATE_LAYER = "block4_pool"
+FISH_GATE_THRESHOLD = 0.90
+
+# Test-time augmentation: jumlah variasi default dan anggaran latensi (ms)
+TTA_VIEWS = 6
+TTA_BUDGET_MS = 1500
+
+# Mode video/kamera: frame yang dianalisis per detik (waktu video), ukuran
+# batch, dan bobot EMA untuk menghaluskan probabilitas antar frame
+VIDEO_SAMPLE_FPS = 4
+VIDEO_BATCH_SIZE = 8
+VIDEO_SMOOTHING = 0.3
+
+HISTORY_DIR = "riwayat_upload"
+
+# Cache prediksi: jumlah entri di memori, folder tingkat disk (None = hanya
+# memori) dan jumlah maksimum file .npy di disk (~1 KB per file)
+PREDICTION_CACHE_SIZE = 512
+PREDICTION_CACHE_DIR = "cache_prediksi"
+PREDICTION_CACHE_DISK_SIZE = 20000
+HISTORY_CSV = "riwayat_deteksi.csv"
+HISTORY_DB = "riwayat.db"
+
+# Thumbnail untuk galeri Riwayat
+THUMBNAIL_DIR = "riwayat_thumbnail"
+THUMBNAIL_SIZE = (320, 320)
+HISTORY_CSV_FIELDS = ["waktu", "prediksi", "confidence", "filename"]
+
+# Deteksi gambar hampir sama: jarak Hamming maksimum antara dHash 64-bit
+# (0 = identik; di bawah 8 dijamin ditemukan oleh indeks pita)
+DEDUP_MAX_DISTANCE = 6
+# Gambar dengan simpangan baku kecerahan di bawah ini (0-255) terlalu polos
+# untuk di-hash dengan andal (mis. frame gelap / over-exposure) dan tidak di-dedup
+DEDUP_MIN_STD = 8.0
+
+
+# Status hasil deteksi, dengan urutan pemeriksaan yang sama seperti di halaman Deteksi
+STATUS_VALID = "valid"
+STATUS_RAGU = "ragu"
+STATUS_BUKAN_IKAN = "bukan_ikan"
+
+
+def interpret_prediction(probabilities):
+    # Mengembalikan (label, confidence, status) dari vektor probabilitas
+    pred_class_idx = int(probabilities.argmax())
+    confidence = float(probabilities[pred_class_idx])
+    label = idx_to_class[pred_class_idx]
+    if label == LABEL_BUKAN_IKAN:
+        status = STATUS_BUKAN_IKAN
+    elif confidence < AMBANG_BATAS:
+        status = STATUS_RAGU
+    else:
+        status = STATUS_VALID
+    return label, confidence, status
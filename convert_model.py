@@ -1,7 +1,188 @@
-from tensorflow import keras
+# ======================
+# Konversi Model ke Format yang Lebih Cepat
+# ======================
+# Dari model999.h5 membuat:
+#   - keras          : model999.keras (format Keras baru)
+#   - savedmodel     : folder SavedModel untuk TF Serving
+#   - tflite-fp16    : TFLite dengan bobot float16 (ukuran ~1/2)
+#   - tflite-dynamic : TFLite dengan kuantisasi dynamic-range int8 (ukuran ~1/4)
+#   - onnx           : ONNX untuk onnxruntime (butuh paket tf2onnx)
+#
+# Setelah konversi, setiap artefak dibandingkan dengan model H5 pada sampel
+# gambar (uji paritas). Hasilnya ditulis ke model_export.json; backends.py
+# tidak akan memilih otomatis artefak yang gagal uji ini.
+#
+# Contoh:
+#   python convert_model.py
+#   python convert_model.py --formats tflite-dynamic onnx --max-samples 64
+import argparse
+import json
+import os
+import sys
 
-# load model dari .h5
-model = keras.models.load_model("model999.h5")
+import numpy as np
 
-# save ulang dengan format .keras
-model.save("model999.keras", save_format="keras")
+from config import EXPORT_REPORT, FOLDER_SAMPEL, MODEL_ARTIFACTS, MODEL_PATH, idx_to_class
+
+SEMUA_FORMAT = ["keras", "savedmodel", "tflite-fp16", "tflite-dynamic", "onnx"]
+FORMAT_DEFAULT = ["tflite-fp16", "tflite-dynamic", "onnx"]
+
+
+# ======================
+# Ekspor
+# ======================
+def export_keras(model, path):
+    model.save(path)
+
+
+def export_savedmodel(model, path):
+    import tensorflow as tf
+    if hasattr(model, "export"):
+        model.export(path)
+    else:
+        tf.saved_model.save(model, path)
+
+
+def export_tflite(model, path, quantization):
+    import tensorflow as tf
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantization == "fp16":
+        converter.target_spec.supported_types = [tf.float16]
+    # quantization == "dynamic": Optimize.DEFAULT tanpa dataset representatif
+    # menghasilkan bobot int8 dengan aktivasi float (dynamic-range)
+    with open(path, "wb") as f:
+        f.write(converter.convert())
+
+
+def export_onnx(model, path):
+    import tensorflow as tf
+    try:
+        import tf2onnx
+    except ImportError:
+        raise RuntimeError("Paket tf2onnx belum terpasang (pip install tf2onnx)")
+    spec = (tf.TensorSpec((None,) + tuple(model.input_shape[1:]), tf.float32, name="input"),)
+    tf2onnx.convert.from_keras(model, input_signature=spec, opset=13, output_path=path)
+
+
+EKSPORTIR = {
+    "keras": export_keras,
+    "savedmodel": export_savedmodel,
+    "tflite-fp16": lambda model, path: export_tflite(model, path, "fp16"),
+    "tflite-dynamic": lambda model, path: export_tflite(model, path, "dynamic"),
+    "onnx": export_onnx,
+}
+
+
+# ======================
+# Uji Paritas
+# ======================
+def load_samples(folders=FOLDER_SAMPEL, max_samples=32):
+    from preprocessing import BatchBuffer, iter_decoded, list_images
+
+    buffer = BatchBuffer(max_samples)
+    n = 0
+    for _, arr in iter_decoded(list_images(folders)):
+        if n >= max_samples:
+            break
+        buffer.put(n, arr)
+        n += 1
+
+    if n == 0:
+        print("Peringatan: tidak ada gambar sampel yang terbaca, memakai input acak.", file=sys.stderr)
+        rng = np.random.default_rng(0)
+        return rng.random((max_samples,) + buffer.data.shape[1:], dtype=np.float32)
+    return buffer.view(n).copy()
+
+
+def parity_check(reference, candidate, min_agreement=0.98, max_abs_diff=0.05):
+    top1_ref = reference.argmax(axis=1)
+    top1_kandidat = candidate.argmax(axis=1)
+    agreement = float((top1_ref == top1_kandidat).mean())
+    diff = float(np.abs(reference - candidate).max())
+    return {
+        "sampel": int(reference.shape[0]),
+        "kesesuaian_top1": round(agreement, 4),
+        "selisih_maks": round(diff, 6),
+        "lolos": agreement >= min_agreement and diff <= max_abs_diff,
+    }
+
+
+def predict_in_batches(predict_fn, samples, batch_size=8):
+    return np.concatenate([
+        np.asarray(predict_fn(samples[i:i + batch_size]))
+        for i in range(0, len(samples), batch_size)
+    ])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Konversi model999.h5 ke format inferensi yang lebih cepat.")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--formats", nargs="+", choices=SEMUA_FORMAT, default=FORMAT_DEFAULT)
+    parser.add_argument("--max-samples", type=int, default=32, help="Jumlah gambar untuk uji paritas")
+    parser.add_argument("--min-agreement", type=float, default=0.98,
+                        help="Minimal kesesuaian prediksi top-1 dengan model H5")
+    parser.add_argument("--max-abs-diff", type=float, default=0.05,
+                        help="Selisih probabilitas maksimum yang diizinkan")
+    args = parser.parse_args(argv)
+
+    from tensorflow import keras
+    model = keras.models.load_model(args.model)
+
+    samples = load_samples(max_samples=args.max_samples)
+    reference = predict_in_batches(model.predict_on_batch, samples)
+
+    laporan = {"model": args.model, "kelas": list(idx_to_class.values()), "artefak": {}, "paritas": {}}
+    if os.path.exists(EXPORT_REPORT):
+        with open(EXPORT_REPORT, encoding='utf-8') as f:
+            lama = json.load(f)
+        laporan["artefak"].update(lama.get("artefak", {}))
+        laporan["paritas"].update(lama.get("paritas", {}))
+
+    for fmt in args.formats:
+        path = MODEL_ARTIFACTS[fmt]
+        print(f"Ekspor {fmt} -> {path}", file=sys.stderr)
+        uji_paritas = fmt in ("tflite-fp16", "tflite-dynamic", "onnx")
+        try:
+            EKSPORTIR[fmt](model, path)
+        except Exception as e:
+            print(f"  gagal: {e}", file=sys.stderr)
+            if uji_paritas:
+                # Artefak lama (jika ada) mungkin setengah tertulis; jangan dipilih otomatis
+                laporan["paritas"][fmt] = {"lolos": False, "alasan": f"ekspor gagal: {e}"}
+            continue
+
+        ukuran = _ukuran(path)
+        laporan["artefak"][fmt] = {"path": path, "ukuran_mb": round(ukuran / 2**20, 2)}
+
+        if uji_paritas:
+            from backends import create_backend
+            try:
+                backend = create_backend(fmt)
+                hasil = parity_check(
+                    reference, predict_in_batches(backend.predict, samples),
+                    args.min_agreement, args.max_abs_diff,
+                )
+            except Exception as e:
+                # mis. tf2onnx terpasang tetapi onnxruntime tidak
+                hasil = {"lolos": False, "alasan": repr(e)}
+            laporan["paritas"][fmt] = hasil
+            print(f"  paritas: {hasil}", file=sys.stderr)
+
+    with open(EXPORT_REPORT, "w", encoding='utf-8') as f:
+        json.dump(laporan, f, indent=2, ensure_ascii=False)
+    print(f"Laporan ditulis ke {EXPORT_REPORT}", file=sys.stderr)
+    return 0
+
+
+def _ukuran(path):
+    if os.path.isdir(path):
+        return sum(
+            os.path.getsize(os.path.join(root, f))
+            for root, _, files in os.walk(path) for f in files
+        )
+    return os.path.getsize(path)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,249 @@
+# ======================
+# Deteksi Gambar Hampir Sama (Near-Duplicate)
+# ======================
+# Foto ikan yang sama sering diunggah berkali-kali dengan selisih beberapa
+# detik. Setiap gambar riwayat diberi hash perseptual dHash 64-bit (disimpan
+# di kolom riwayat.phash). Saat unggahan baru mirip dengan catatan lama
+# (jarak Hamming <= DEDUP_MAX_DISTANCE), hasil lama dipakai ulang: tidak ada
+# inferensi dan tidak ada salinan gambar baru di riwayat_upload.
+#
+# Indeks di memori memakai 8 pita 8-bit: dua hash dengan jarak < 8 pasti sama
+# persis di salah satu pita, jadi pencarian cukup memeriksa kandidat dari
+# 8 dict, bukan seluruh riwayat.
+#
+# Hasil lama hanya dipakai ulang jika dihasilkan versi model yang sama
+# (kolom riwayat.model_version). Gambar yang terlalu polos (frame gelap,
+# over-exposure) tidak di-hash sama sekali: dHash-nya 0 atau acak, sehingga
+# semua gambar polos akan tampak "identik".
+#
+#   python dedup.py            # laporan duplikat di riwayat yang ada (dry run)
+#   python dedup.py --apply    # hapus duplikat, sisakan yang paling lama
+import argparse
+import os
+import threading
+from collections import defaultdict
+
+import numpy as np
+from PIL import Image
+
+from config import DEDUP_MAX_DISTANCE, DEDUP_MIN_STD
+from preprocessing import PREVIEW_SIZE, load_image
+
+JUMLAH_PITA = 8
+BIT_PITA = 64 // JUMLAH_PITA
+_MASK_PITA = (1 << BIT_PITA) - 1
+# Hash tanpa informasi (semua piksel tetangga sama / semua menaik)
+HASH_DEGENERATE = {0, (1 << 64) - 1}
+
+
+def dhash(img, hash_size=8):
+    # Perbandingan kecerahan piksel bertetangga pada gambar abu-abu 9x8
+    if img.mode != 'L':
+        img = img.convert('L')
+    kecil = img.resize((hash_size + 1, hash_size), Image.BILINEAR, reducing_gap=3.0)
+    arr = np.asarray(kecil, dtype=np.int16)
+    bits = (arr[:, 1:] > arr[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def reliable_dhash(img, min_std=DEDUP_MIN_STD):
+    # dHash, atau None jika gambar terlalu polos untuk dibandingkan dengan andal
+    abu = img.convert('L')
+    contoh = np.asarray(abu.resize((32, 32), Image.BILINEAR, reducing_gap=3.0), dtype=np.float32)
+    if contoh.std() < min_std:
+        return None
+    h = dhash(abu)
+    return None if h in HASH_DEGENERATE else h
+
+
+def dhash_file(path):
+    # Decode dengan draft yang sama seperti halaman Deteksi agar hash sebanding
+    return reliable_dhash(load_image(path, draft_size=PREVIEW_SIZE))
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+# SQLite INTEGER bertanda 64-bit, hash tidak bertanda
+def to_signed(h):
+    return h - (1 << 64) if h >= (1 << 63) else h
+
+
+def to_unsigned(h):
+    return h + (1 << 64) if h < 0 else h
+
+
+class PHashIndex:
+    def __init__(self):
+        self._hashes = {}
+        self._pita = [defaultdict(set) for _ in range(JUMLAH_PITA)]
+
+    def __len__(self):
+        return len(self._hashes)
+
+    @staticmethod
+    def _bands(h):
+        return [(h >> (i * BIT_PITA)) & _MASK_PITA for i in range(JUMLAH_PITA)]
+
+    def add(self, key, h):
+        self.remove(key)
+        self._hashes[key] = h
+        for pita, nilai in zip(self._pita, self._bands(h)):
+            pita[nilai].add(key)
+
+    def remove(self, key):
+        h = self._hashes.pop(key, None)
+        if h is None:
+            return
+        for pita, nilai in zip(self._pita, self._bands(h)):
+            pita[nilai].discard(key)
+            if not pita[nilai]:
+                del pita[nilai]
+
+    def query(self, h, max_distance):
+        # Daftar (jarak, key) terurut dari yang paling mirip
+        kandidat = set()
+        for pita, nilai in zip(self._pita, self._bands(h)):
+            kandidat |= pita.get(nilai, set())
+        hasil = [(hamming(h, self._hashes[k]), k) for k in kandidat]
+        return sorted(x for x in hasil if x[0] <= max_distance)
+
+
+class DuplicateDetector:
+    def __init__(self, store, max_distance=DEDUP_MAX_DISTANCE):
+        # max_distance >= 8 tetap berjalan, tapi tidak lagi dijamin lengkap
+        self.store = store
+        self.max_distance = max_distance
+        self._index = PHashIndex()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+        for record_id, phash in store.phashes():
+            if to_unsigned(phash) not in HASH_DEGENERATE:
+                self._index.add(record_id, to_unsigned(phash))
+
+    def lookup(self, img, model_version):
+        # Mengembalikan (hash, catatan riwayat yang mirip atau None, jarak).
+        # Hash None berarti gambar terlalu polos: tidak di-dedup dan tidak diindeks.
+        h = reliable_dhash(img)
+        if h is None:
+            with self._lock:
+                self.skipped += 1
+            return None, None, None
+        with self._lock:
+            kandidat = self._index.query(h, self.max_distance)
+        for jarak, record_id in kandidat:
+            record = self.store.get(record_id)
+            if record is None:
+                # Sudah dihapus di luar aplikasi (mis. lewat dedup.py --apply)
+                self.remove(record_id)
+                continue
+            # Probabilitas dari model/backend lain tidak boleh dipakai ulang
+            if record["probabilities"] and record.get("model_version") == model_version:
+                with self._lock:
+                    self.hits += 1
+                return h, record, jarak
+        with self._lock:
+            self.misses += 1
+        return h, None, None
+
+    def add(self, record_id, h):
+        # Menerima hash bertanda (dari SQLite / HistoryWriter) maupun tidak
+        with self._lock:
+            self._index.add(record_id, to_unsigned(h))
+
+    def remove(self, record_id):
+        with self._lock:
+            self._index.remove(record_id)
+
+    def stats(self):
+        with self._lock:
+            indexed = len(self._index)
+        return {"indexed": indexed, "hits": self.hits, "misses": self.misses, "skipped": self.skipped}
+
+
+# ======================
+# Deduplikasi Riwayat yang Sudah Ada
+# ======================
+def backfill_hashes(store, log=print):
+    # Hash untuk catatan lama (impor dari riwayat_upload / sebelum kolom phash ada)
+    terisi = 0
+    for record_id, image_path in store.without_phash():
+        try:
+            h = dhash_file(image_path)
+            if h is None:
+                continue  # gambar polos: tidak ikut deduplikasi
+            store.set_phash(record_id, to_signed(h))
+            terisi += 1
+        except OSError as e:
+            log(f"Lewati {image_path}: {e}")
+    return terisi
+
+
+def find_duplicates(store, max_distance=DEDUP_MAX_DISTANCE):
+    # Catatan diproses dari yang paling lama; setiap catatan yang mirip dengan
+    # catatan yang dipertahankan (dan berlabel sama) dianggap duplikat.
+    index = PHashIndex()
+    label_simpan = {}
+    grup = defaultdict(list)
+    for record_id, phash in store.phashes():
+        h = to_unsigned(phash)
+        if h in HASH_DEGENERATE:
+            continue
+        record = store.get(record_id)
+        asli = next((k for _, k in index.query(h, max_distance)
+                     if label_simpan[k] == record["label"]), None)
+        if asli is None:
+            index.add(record_id, h)
+            label_simpan[record_id] = record["label"]
+        else:
+            grup[asli].append(record_id)
+    return dict(grup)
+
+
+def _ukuran(path):
+    try:
+        return os.path.getsize(path)
+    except (OSError, TypeError):
+        return 0
+
+
+def main():
+    from history_store import HistoryStore
+    from thumbnails import remove_thumbnail, thumbnail_path
+
+    parser = argparse.ArgumentParser(description="Cari dan hapus gambar hampir sama di riwayat deteksi.")
+    parser.add_argument("--max-distance", type=int, default=DEDUP_MAX_DISTANCE,
+                        help="Jarak Hamming maksimum dHash 64-bit")
+    parser.add_argument("--apply", action="store_true",
+                        help="Hapus duplikat (default hanya laporan)")
+    args = parser.parse_args()
+
+    store = HistoryStore()
+    terisi = backfill_hashes(store)
+    if terisi:
+        print(f"Hash dihitung untuk {terisi} catatan lama.")
+
+    grup = find_duplicates(store, args.max_distance)
+    jumlah, hemat = 0, 0
+    for asli, duplikat in grup.items():
+        print(f"{store.get(asli)['image_path']}")
+        for record_id in duplikat:
+            record = store.get(record_id)
+            path = record["image_path"]
+            jumlah += 1
+            hemat += _ukuran(path) + (_ukuran(thumbnail_path(path)) if path else 0)
+            print(f"  = {path}")
+            if args.apply:
+                store.delete(record_id)
+                if path:
+                    remove_thumbnail(path)
+
+    aksi = "dihapus" if args.apply else "akan dihapus (jalankan dengan --apply)"
+    print(f"{jumlah} duplikat dalam {len(grup)} grup {aksi}, {hemat / 1e6:.1f} MB.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+# ======================
+# Gerbang "Bukan Ikan" (Early Exit)
+# ======================
+# Banyak unggahan ternyata bukan foto ikan, tetapi tetap menjalankan Xception
+# penuh. Gerbang ini hanya memakai blok awal Xception yang sama (entry flow
+# sampai FISH_GATE_LAYER, tanpa middle/exit flow yang memakan sebagian besar
+# komputasi), global average pooling, lalu regresi logistik kecil di numpy
+# yang memprediksi p(bukan ikan).
+#
+# Gambar ditolak lebih awal hanya jika p >= FISH_GATE_THRESHOLD; sisanya
+# tetap masuk model penuh, jadi ambang tinggi berarti lebih sedikit
+# penolakan keliru.
+#
+# Kepala regresi dilatih dari putusan model penuh (model penuh = guru) atas
+# gambar di folder sampel, ditambah folder berlabel opsional:
+#   python fish_gate.py train --non-fish contoh/bukan_ikan --fish contoh/ikan
+# Benchmark latensi yang dihemat vs. akurasi yang hilang untuk beberapa ambang:
+#   python fish_gate.py bench --thresholds 0.8 0.9 0.95
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+from config import (FISH_GATE_LAYER, FISH_GATE_PATH, FISH_GATE_THRESHOLD, FOLDER_HASIL, FOLDER_SAMPEL,
+                    LABEL_BUKAN_IKAN, MODEL_PATH, class_labels, idx_to_class)
+from preprocessing import BatchBuffer, iter_decoded, list_images
+
+INDEKS_BUKAN_IKAN = class_labels[LABEL_BUKAN_IKAN]
+JUMLAH_KELAS = len(idx_to_class)
+
+
+# ======================
+# Ekstraktor Fitur (Xception terpotong)
+# ======================
+def find_layer(model, name):
+    # Mengembalikan (model pemilik, layer); backbone Xception bisa berada di
+    # dalam model Sequential sebagai satu layer bersarang
+    try:
+        return model, model.get_layer(name)
+    except ValueError:
+        pass
+    for layer in model.layers:
+        if hasattr(layer, "layers"):
+            hasil = find_layer(layer, name)
+            if hasil is not None:
+                return hasil
+    return None
+
+
+def build_extractor(model, layer_name=FISH_GATE_LAYER):
+    from tensorflow import keras
+    hasil = find_layer(model, layer_name)
+    if hasil is None:
+        raise ValueError(f"Layer {layer_name!r} tidak ditemukan di model")
+    pemilik, layer = hasil
+    fitur = keras.layers.GlobalAveragePooling2D()(layer.output)
+    return keras.Model(pemilik.input, fitur, name=f"gerbang_{layer_name}")
+
+
+def load_keras_model(backend=None):
+    # Pakai ulang model Keras yang sudah dimuat backend jika ada
+    model = getattr(backend, "model", None)
+    if model is not None:
+        return model
+    from tensorflow.keras.models import load_model
+    return load_model(MODEL_PATH)
+
+
+# ======================
+# Kepala Regresi Logistik
+# ======================
+def _sigmoid(z):
+    return 1.0 / (1.0 + np.exp(-np.clip(z, -30, 30)))
+
+
+def fit_logistic(features, labels, l2=1e-2, epochs=2000, lr=0.5):
+    # Gradient descent full-batch atas fitur yang distandardisasi; kelas
+    # diberi bobot seimbang karena contoh "bukan ikan" biasanya lebih sedikit
+    mean = features.mean(axis=0)
+    std = features.std(axis=0) + 1e-6
+    x = (features - mean) / std
+    y = labels.astype(np.float64)
+    positif = max(y.mean(), 1e-6)
+    bobot = np.where(y == 1, 0.5 / positif, 0.5 / max(1 - positif, 1e-6))
+
+    w = np.zeros(x.shape[1])
+    b = 0.0
+    for _ in range(epochs):
+        galat = (_sigmoid(x @ w + b) - y) * bobot / len(y)
+        w -= lr * (x.T @ galat + l2 * w)
+        b -= lr * galat.sum()
+    return mean.astype(np.float32), std.astype(np.float32), w.astype(np.float32), np.float32(b)
+
+
+def rejection_probabilities(p_bukan_ikan):
+    # Vektor probabilitas pengganti untuk gambar yang ditolak gerbang, agar
+    # pemanggil tetap bisa memakai interpret_prediction() seperti biasa
+    probs = np.full(JUMLAH_KELAS, (1.0 - p_bukan_ikan) / (JUMLAH_KELAS - 1), dtype=np.float32)
+    probs[INDEKS_BUKAN_IKAN] = p_bukan_ikan
+    return probs
+
+
+class FishGate:
+    def __init__(self, extractor, mean, std, w, b, threshold=FISH_GATE_THRESHOLD):
+        self.extractor = extractor
+        self.mean, self.std, self.w, self.b = mean, std, w, b
+        self.threshold = threshold
+
+    @classmethod
+    def load(cls, path=FISH_GATE_PATH, model=None, threshold=FISH_GATE_THRESHOLD):
+        data = np.load(path)
+        extractor = build_extractor(model if model is not None else load_keras_model(),
+                                    str(data["layer"]))
+        return cls(extractor, data["mean"], data["std"], data["w"], data["b"], threshold)
+
+    def probability(self, batch):
+        # batch: float32 (N, 299, 299, 3) yang sudah dinormalisasi
+        fitur = np.asarray(self.extractor.predict_on_batch(batch))
+        return _sigmoid(((fitur - self.mean) / self.std) @ self.w + self.b)
+
+    def check(self, x):
+        # Satu gambar (299, 299, 3) atau (1, 299, 299, 3) -> (ditolak?, p)
+        if x.ndim == 3:
+            x = x[np.newaxis]
+        p = float(self.probability(x)[0])
+        return p >= self.threshold, p
+
+
+# ======================
+# Data Latih / Uji
+# ======================
+def collect_samples(folders, label=None):
+    # Daftar (path, array uint8, label paksa atau None)
+    return [(path, arr, label) for path, arr in iter_decoded(list_images(folders, recursive=True))]
+
+
+def _in_batches(fn, arrays, batch_size=16):
+    buffer = BatchBuffer(batch_size)
+    keluaran = []
+    for mulai in range(0, len(arrays), batch_size):
+        potongan = arrays[mulai:mulai + batch_size]
+        for i, arr in enumerate(potongan):
+            buffer.put(i, arr)
+        keluaran.append(np.asarray(fn(buffer.view(len(potongan)))))
+    return np.concatenate(keluaran)
+
+
+def train(samples, backend, layer_name=FISH_GATE_LAYER, output=FISH_GATE_PATH):
+    arrays = [arr for _, arr, _ in samples]
+    extractor = build_extractor(load_keras_model(backend), layer_name)
+    fitur = _in_batches(extractor.predict_on_batch, arrays)
+
+    # Label dari model penuh, kecuali gambar dari folder berlabel
+    guru = _in_batches(backend.predict, arrays).argmax(axis=1) == INDEKS_BUKAN_IKAN
+    labels = np.array([paksa if paksa is not None else g for (_, _, paksa), g in zip(samples, guru)])
+    if labels.all() or not labels.any():
+        raise ValueError("Data latih harus berisi gambar ikan dan bukan ikan "
+                         "(tambahkan --non-fish / --fish)")
+
+    mean, std, w, b = fit_logistic(fitur, labels)
+    p = _sigmoid(((fitur - mean) / std) @ w + b)
+    np.savez(output, layer=layer_name, mean=mean, std=std, w=w, b=b)
+    return {
+        "sampel": len(labels),
+        "bukan_ikan": int(labels.sum()),
+        "akurasi_latih_0.5": round(float(((p >= 0.5) == labels).mean()), 4),
+        "output": output,
+    }
+
+
+# ======================
+# Benchmark: model penuh vs. gerbang + model penuh
+# ======================
+def _timed(fn, x, repeat):
+    durasi = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        hasil = fn(x)
+        durasi.append((time.perf_counter() - t0) * 1000)
+    return hasil, float(np.median(durasi))
+
+
+def bench(samples, backend, gate, thresholds, repeat=3):
+    # Setiap gambar diukur satu per satu (batch 1), seperti di model_prediction.
+    # Latensi jalur bergerbang per ambang dihitung dari waktu terukur:
+    # gerbang + (model penuh jika tidak ditolak).
+    buffer = BatchBuffer(1)
+    x = buffer.view(1)
+    buffer.put(0, samples[0][1])
+    backend.predict(x)
+    gate.probability(x)  # pemanasan
+
+    p_gerbang, ms_gerbang, ms_penuh, penuh_bukan_ikan = [], [], [], []
+    for _, arr, paksa in samples:
+        buffer.put(0, arr)
+        p, ms_g = _timed(gate.probability, x, repeat)
+        preds, ms_f = _timed(backend.predict, x, repeat)
+        p_gerbang.append(float(p[0]))
+        ms_gerbang.append(ms_g)
+        ms_penuh.append(ms_f)
+        penuh_bukan_ikan.append(int(np.argmax(preds[0])) == INDEKS_BUKAN_IKAN if paksa is None else paksa)
+
+    p_gerbang, ms_gerbang, ms_penuh = map(np.asarray, (p_gerbang, ms_gerbang, ms_penuh))
+    acuan = np.asarray(penuh_bukan_ikan)
+    rata_penuh = float(ms_penuh.mean())
+
+    hasil = []
+    for ambang in thresholds:
+        ditolak = p_gerbang >= ambang
+        rata_gerbang = float((ms_gerbang + np.where(ditolak, 0.0, ms_penuh)).mean())
+        hasil.append({
+            "ambang": ambang,
+            "rasio_ditolak": round(float(ditolak.mean()), 4),
+            "latensi_penuh_ms": round(rata_penuh, 3),
+            "latensi_gerbang_ms": round(rata_gerbang, 3),
+            "hemat_ms": round(rata_penuh - rata_gerbang, 3),
+            "hemat_persen": round((rata_penuh - rata_gerbang) / rata_penuh * 100, 2) if rata_penuh else 0.0,
+            # Akurasi yang hilang: gambar ikan yang ikut ditolak (hasil penyakitnya tidak pernah dihitung)
+            "penolakan_keliru": int((ditolak & ~acuan).sum()),
+            "akurasi_hilang_persen": round(float((ditolak & ~acuan).mean()) * 100, 2),
+            "recall_bukan_ikan": round(float(ditolak[acuan].mean()), 4) if acuan.any() else None,
+        })
+    return {
+        "sampel": len(samples),
+        "bukan_ikan_menurut_acuan": int(acuan.sum()),
+        "latensi_gerbang_saja_ms": round(float(ms_gerbang.mean()), 3),
+        "ambang": hasil,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Latih atau ukur gerbang 'bukan ikan' sebelum model penuh.")
+    parser.add_argument("command", choices=["train", "bench"])
+    parser.add_argument("folders", nargs="*", default=FOLDER_SAMPEL,
+                        help="Folder gambar berlabel dari model penuh. Default: image/ dan riwayat_upload/")
+    parser.add_argument("--non-fish", nargs="*", default=[], help="Folder gambar yang pasti bukan ikan")
+    parser.add_argument("--fish", nargs="*", default=[], help="Folder gambar yang pasti ikan")
+    parser.add_argument("--backend", default=None,
+                        help="Backend model penuh: keras / tflite-dynamic / tflite-fp16 / onnx / auto")
+    parser.add_argument("--layer", default=FISH_GATE_LAYER, help="Layer Xception tempat model dipotong")
+    parser.add_argument("--gate", default=FISH_GATE_PATH, help="File bobot gerbang (.npz)")
+    parser.add_argument("--thresholds", nargs="+", type=float,
+                        default=sorted({0.5, 0.7, 0.8, 0.9, 0.95, FISH_GATE_THRESHOLD}))
+    parser.add_argument("--repeat", type=int, default=3, help="Pengulangan per gambar (median)")
+    parser.add_argument("-o", "--output", help="File JSON hasil bench. Default: benchmark_results/<waktu>_gerbang.json")
+    args = parser.parse_args(argv)
+
+    samples = (collect_samples(args.folders)
+               + collect_samples(args.non_fish, label=True)
+               + collect_samples(args.fish, label=False))
+    if not samples:
+        parser.error("Tidak ada gambar yang bisa dibaca")
+
+    from backends import load_backend
+    backend = load_backend(args.backend)
+    print(f"{len(samples)} gambar, backend model penuh: {backend.name}", file=sys.stderr)
+
+    if args.command == "train":
+        print(json.dumps(train(samples, backend, args.layer, args.gate), indent=2, ensure_ascii=False))
+        return 0
+
+    from benchmark import metadata
+    gate = FishGate.load(args.gate, model=load_keras_model(backend))
+    laporan = {"meta": metadata(), "backend": backend.name, "gerbang": args.gate,
+               **bench(samples, backend, gate, args.thresholds, args.repeat)}
+
+    output = args.output
+    if not output:
+        os.makedirs(FOLDER_HASIL, exist_ok=True)
+        output = os.path.join(FOLDER_HASIL, f"{datetime.now():%Y%m%d_%H%M%S}_gerbang.json")
+    with open(output, "w", encoding='utf-8') as f:
+        json.dump(laporan, f, indent=2, ensure_ascii=False)
+
+    print(f"{'ambang':>7}{'ditolak':>9}{'penuh ms':>10}{'gerbang ms':>12}{'hemat':>8}{'akurasi hilang':>16}")
+    for baris in laporan["ambang"]:
+        print(f"{baris['ambang']:>7.2f}{baris['rasio_ditolak'] * 100:>8.1f}%"
+              f"{baris['latensi_penuh_ms']:>10.1f}{baris['latensi_gerbang_ms']:>12.1f}"
+              f"{baris['hemat_persen']:>7.1f}%{baris['akurasi_hilang_persen']:>15.2f}%")
+    print(f"Hasil ditulis ke {output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,241 @@
+# ======================
+# Penyimpanan Riwayat Deteksi (SQLite)
+# ======================
+# Sebelumnya halaman Riwayat membaca ulang seluruh isi folder riwayat_upload
+# dan mem-parsing nama file di setiap rerun, dan hanya label yang tersisa.
+# Sekarang setiap deteksi dicatat ke SQLite saat itu juga (waktu, label,
+# keyakinan, seluruh vektor probabilitas, path gambar) dengan indeks pada
+# waktu dan label, sehingga daftar dan filter cukup membaca satu halaman data.
+# Jumlah catatan (total dan per label) disimpan di tabel riwayat_jumlah yang
+# diperbarui oleh add/delete/import_legacy, jadi hitungan untuk paginasi
+# tidak memindai tabel riwayat.
+import json
+import os
+import sqlite3
+import threading
+from collections import Counter
+from datetime import datetime
+
+from config import EKSTENSI_GAMBAR, HISTORY_CSV, HISTORY_DB, HISTORY_DIR
+
+FORMAT_WAKTU = "%Y-%m-%d %H:%M:%S"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS riwayat (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    waktu TEXT NOT NULL,
+    label TEXT NOT NULL,
+    confidence REAL,
+    probabilities TEXT,
+    image_path TEXT,
+    phash INTEGER,
+    model_version TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_riwayat_waktu ON riwayat (waktu);
+CREATE INDEX IF NOT EXISTS idx_riwayat_label_waktu ON riwayat (label, waktu);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_riwayat_image_path ON riwayat (image_path);
+CREATE TABLE IF NOT EXISTS riwayat_jumlah (
+    label TEXT PRIMARY KEY,
+    jumlah INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+TAMBAH_JUMLAH = (
+    "INSERT INTO riwayat_jumlah (label, jumlah) VALUES (?, ?) "
+    "ON CONFLICT (label) DO UPDATE SET jumlah = jumlah + excluded.jumlah"
+)
+
+
+class HistoryStore:
+    def __init__(self, db_path=HISTORY_DB):
+        self.db_path = db_path
+        # Satu koneksi dibagi antar thread Streamlit, dijaga dengan lock
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            jumlah_baru = self._conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'riwayat_jumlah'"
+            ).fetchone() is None
+            self._conn.executescript(SCHEMA)
+            self._migrate(jumlah_baru)
+
+    def _migrate(self, jumlah_baru=False):
+        # Database lama dibuat sebelum kolom phash (hash perseptual) dan
+        # model_version (versi model yang menghasilkan probabilitas) ada
+        kolom = {row[1] for row in self._conn.execute("PRAGMA table_info(riwayat)")}
+        if "phash" not in kolom:
+            self._conn.execute("ALTER TABLE riwayat ADD COLUMN phash INTEGER")
+        if "model_version" not in kolom:
+            self._conn.execute("ALTER TABLE riwayat ADD COLUMN model_version TEXT")
+        if jumlah_baru:
+            # Sekali jalan untuk database yang dibuat sebelum riwayat_jumlah ada
+            self._conn.execute(
+                "INSERT INTO riwayat_jumlah (label, jumlah) SELECT label, COUNT(*) FROM riwayat GROUP BY label"
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # ----------------------
+    # Tulis
+    # ----------------------
+    def add(self, label, confidence, probabilities=None, image_path=None, waktu=None, phash=None,
+            model_version=None):
+        waktu = waktu or datetime.now()
+        if probabilities is not None:
+            probabilities = json.dumps([round(float(p), 6) for p in probabilities])
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                "INSERT INTO riwayat (waktu, label, confidence, probabilities, image_path, phash, model_version) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (waktu.strftime(FORMAT_WAKTU), label,
+                 None if confidence is None else float(confidence),
+                 probabilities, image_path, phash, model_version),
+            )
+            self._conn.execute(TAMBAH_JUMLAH, (label, 1))
+            return cur.lastrowid
+
+    def set_phash(self, record_id, phash):
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE riwayat SET phash = ? WHERE id = ?", (phash, record_id))
+
+    def delete(self, record_id, delete_file=True):
+        record = self.get(record_id)
+        if record is None:
+            return False
+        with self._lock, self._conn:
+            cur = self._conn.execute("DELETE FROM riwayat WHERE id = ?", (record_id,))
+            if cur.rowcount:
+                self._conn.execute(TAMBAH_JUMLAH, (record["label"], -1))
+                self._conn.execute("DELETE FROM riwayat_jumlah WHERE label = ? AND jumlah <= 0",
+                                   (record["label"],))
+        if delete_file and record["image_path"]:
+            try:
+                os.remove(record["image_path"])
+            except FileNotFoundError:
+                pass
+        return True
+
+    # ----------------------
+    # Baca
+    # ----------------------
+    @staticmethod
+    def _where(label=None, since=None, until=None):
+        kondisi, params = [], []
+        if label:
+            kondisi.append("label = ?")
+            params.append(label)
+        if since:
+            kondisi.append("waktu >= ?")
+            params.append(since.strftime(FORMAT_WAKTU))
+        if until:
+            kondisi.append("waktu < ?")
+            params.append(until.strftime(FORMAT_WAKTU))
+        return (" WHERE " + " AND ".join(kondisi)) if kondisi else "", params
+
+    @staticmethod
+    def _to_dict(row):
+        record = dict(row)
+        record["waktu"] = datetime.strptime(record["waktu"], FORMAT_WAKTU)
+        if record["probabilities"]:
+            record["probabilities"] = json.loads(record["probabilities"])
+        return record
+
+    def get(self, record_id):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM riwayat WHERE id = ?", (record_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def list(self, limit=20, offset=0, label=None, since=None, until=None):
+        # Terbaru lebih dulu; memakai indeks (label, waktu) / (waktu)
+        where, params = self._where(label, since, until)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM riwayat{where} ORDER BY waktu DESC, id DESC LIMIT ? OFFSET ?",
+                params + [limit, offset],
+            ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def count(self, label=None, since=None, until=None):
+        # Tanpa rentang waktu: dibaca dari riwayat_jumlah, bukan COUNT(*)
+        if since is None and until is None:
+            with self._lock:
+                if label:
+                    row = self._conn.execute(
+                        "SELECT jumlah FROM riwayat_jumlah WHERE label = ?", (label,)
+                    ).fetchone()
+                    return row[0] if row else 0
+                return self._conn.execute("SELECT COALESCE(SUM(jumlah), 0) FROM riwayat_jumlah").fetchone()[0]
+        where, params = self._where(label, since, until)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM riwayat{where}", params).fetchone()[0]
+
+    def phashes(self):
+        # Daftar (id, phash) untuk membangun indeks duplikat di memori
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, phash FROM riwayat WHERE phash IS NOT NULL ORDER BY waktu, id"
+            ).fetchall()
+
+    def without_phash(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, image_path FROM riwayat WHERE phash IS NULL AND image_path IS NOT NULL"
+            ).fetchall()
+
+    def is_empty(self):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM riwayat LIMIT 1").fetchone() is None
+
+    # ----------------------
+    # Migrasi data lama
+    # ----------------------
+    def import_legacy(self, history_dir=HISTORY_DIR, csv_path=HISTORY_CSV):
+        # Sekali jalan: catat gambar lama di riwayat_upload (label & waktu dari
+        # nama file) dan keyakinan dari riwayat_deteksi.csv bila tersedia.
+        keyakinan_csv = {}
+        if csv_path and os.path.exists(csv_path):
+            import csv
+            with open(csv_path, newline='', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    try:
+                        keyakinan_csv[row["filename"]] = float(row["confidence"])
+                    except (KeyError, TypeError, ValueError):
+                        continue
+
+        try:
+            files = [f for f in os.listdir(history_dir) if f.endswith(EKSTENSI_GAMBAR)]
+        except FileNotFoundError:
+            return 0
+
+        baris = []
+        for file_name in files:
+            try:
+                parts = file_name.split('_')
+                waktu = datetime.strptime(f"{parts[0]}_{parts[1]}", "%Y%m%d_%H%M%S")
+                label = os.path.splitext("_".join(parts[2:]))[0]
+            except (ValueError, IndexError):
+                label = os.path.splitext(file_name)[0]
+                waktu = datetime.fromtimestamp(os.path.getmtime(os.path.join(history_dir, file_name)))
+            baris.append((
+                waktu.strftime(FORMAT_WAKTU), label, keyakinan_csv.get(file_name),
+                None, os.path.join(history_dir, file_name),
+            ))
+
+        # Baris per baris agar hanya catatan yang benar-benar masuk yang dihitung
+        masuk = Counter()
+        with self._lock, self._conn:
+            for nilai in baris:
+                cur = self._conn.execute(
+                    "INSERT OR IGNORE INTO riwayat (waktu, label, confidence, probabilities, image_path) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    nilai,
+                )
+                if cur.rowcount:
+                    masuk[nilai[1]] += 1
+            self._conn.executemany(TAMBAH_JUMLAH, masuk.items())
+        return sum(masuk.values())
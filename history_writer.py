@@ -0,0 +1,153 @@
+# ======================
+# Penulis Riwayat di Latar Belakang
+# ======================
+# Menyimpan JPEG resolusi penuh, thumbnail, dan catatan SQLite memakan waktu
+# encode + I/O disk. Pekerjaan itu diserahkan ke thread penulis dengan
+# antrean terbatas, sehingga pengguna hanya menunggu inferensi dan tampilan.
+#
+# - Backpressure: jika antrean penuh, submit() menunggu sampai put_timeout
+#   lalu melempar WriterBusy (pemanggil boleh menyimpan secara langsung).
+# - Flush saat shutdown: close() dipanggil lewat atexit dan menunggu antrean kosong.
+# - Error tidak hilang: dicatat ke logger dan bisa dibaca lewat stats().
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from config import HISTORY_DIR
+from thumbnails import save_thumbnail
+
+logger = logging.getLogger(__name__)
+
+_BERHENTI = object()
+
+
+class WriterBusy(RuntimeError):
+    pass
+
+
+class HistoryWriter:
+    def __init__(self, store, history_dir=HISTORY_DIR, max_pending=32, put_timeout=2.0, on_saved=None):
+        self.store = store
+        # Dipanggil dengan (record_id, phash) setelah catatan tersimpan
+        self.on_saved = on_saved
+        self.history_dir = history_dir
+        self.put_timeout = put_timeout
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._closed = False
+        # Path yang sudah dipesan tapi belum selesai ditulis
+        self._reserved = set()
+        self.written = 0
+        self.failed = 0
+        self.errors = deque(maxlen=20)
+
+        self._worker = threading.Thread(target=self._loop, name="history-writer", daemon=True)
+        self._worker.start()
+        atexit.register(self.close)
+
+    def save_path(self, label, waktu):
+        # Beberapa deteksi dalam detik yang sama tidak boleh saling menimpa
+        timestamp = waktu.strftime("%Y%m%d_%H%M%S")
+        with self._lock:
+            nomor = 1
+            while True:
+                akhiran = "" if nomor == 1 else f" ({nomor})"
+                path = os.path.join(self.history_dir, f"{timestamp}_{label}{akhiran}.jpg")
+                if path not in self._reserved and not os.path.exists(path):
+                    self._reserved.add(path)
+                    return path
+                nomor += 1
+
+    def submit(self, img, label, confidence, probabilities, waktu=None, phash=None, model_version=None):
+        # Mengembalikan path tempat gambar akan disimpan
+        if self._closed:
+            raise RuntimeError("HistoryWriter sudah ditutup.")
+        waktu = waktu or datetime.now()
+        job = (img, label, confidence, probabilities, waktu, phash, model_version,
+               self.save_path(label, waktu))
+        try:
+            self._queue.put(job, timeout=self.put_timeout)
+        except queue.Full:
+            self._release(job[-1])
+            raise WriterBusy("Antrean penyimpanan riwayat penuh.")
+        return job[-1]
+
+    def write_now(self, img, label, confidence, probabilities, waktu=None, phash=None, model_version=None):
+        # Jalur sinkron, dipakai sebagai cadangan saat antrean penuh
+        waktu = waktu or datetime.now()
+        job = (img, label, confidence, probabilities, waktu, phash, model_version,
+               self.save_path(label, waktu))
+        try:
+            self._write(job)
+        finally:
+            self._release(job[-1])
+        return job[-1]
+
+    def _release(self, path):
+        with self._lock:
+            self._reserved.discard(path)
+
+    def _write(self, job):
+        img, label, confidence, probabilities, waktu, phash, model_version, save_path = job
+        os.makedirs(os.path.dirname(save_path) or ".", exist_ok=True)
+        img.save(save_path)
+        save_thumbnail(img, save_path)
+        record_id = self.store.add(label, confidence, probabilities, save_path, waktu=waktu,
+                                   phash=phash, model_version=model_version)
+        if self.on_saved is not None and phash is not None:
+            self.on_saved(record_id, phash)
+
+    def _loop(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job is _BERHENTI:
+                    return
+                self._write(job)
+                with self._lock:
+                    self.written += 1
+            except Exception as e:
+                logger.exception("Gagal menyimpan riwayat %s", job[-1])
+                with self._lock:
+                    self.failed += 1
+                    self.errors.append((datetime.now(), job[-1], repr(e)))
+            finally:
+                if job is not _BERHENTI:
+                    self._release(job[-1])
+                self._queue.task_done()
+
+    def flush(self, timeout=None):
+        # Menunggu semua pekerjaan di antrean selesai ditulis
+        batas = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if batas is not None and time.monotonic() >= batas:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def close(self, timeout=30.0):
+        if self._closed:
+            return
+        self._closed = True
+        # Dipanggil lewat atexit: jangan sampai antrean penuh menggantung shutdown
+        try:
+            self._queue.put(_BERHENTI, timeout=timeout)
+        except queue.Full:
+            logger.error("Antrean riwayat masih penuh saat ditutup; %d penyimpanan mungkin hilang",
+                         self._queue.qsize())
+            return
+        self._worker.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pending": self._queue.qsize(),
+                "written": self.written,
+                "failed": self.failed,
+                "last_error": self.errors[-1] if self.errors else None,
+            }
@@ -0,0 +1,216 @@
+# ======================
+# Mesin Inferensi dengan Micro-Batching
+# ======================
+# Semua sesi Streamlit berbagi satu model. Daripada tiap klik memanggil
+# model.predict() sendiri-sendiri (dan saling menunggu), permintaan dari
+# semua sesi dimasukkan ke satu antrean, digabung menjadi satu batch
+# (sampai ukuran maksimum atau batas waktu tunggu), lalu dijalankan dalam
+# satu forward pass. Hasilnya dibagikan kembali ke masing-masing pemanggil.
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class EngineStopped(RuntimeError):
+    pass
+
+
+# ======================
+# Pemuat Model di Latar Belakang
+# ======================
+# Memuat model (dan TensorFlow) memakan beberapa detik. Loader menjalankannya
+# di thread terpisah lalu melakukan forward pass dummy agar graph sudah
+# di-trace sebelum permintaan pertama, sementara halaman yang tidak memakai
+# model tetap tampil seketika.
+class ModelLoader:
+    def __init__(self, load_fn, warmup_shapes=((1, 299, 299, 3),)):
+        self._load_fn = load_fn
+        self._warmup_shapes = warmup_shapes
+        self._ready = threading.Event()
+        self.backend = None
+        self.error = None
+        self.load_seconds = None
+        self._thread = threading.Thread(target=self._run, name="model-loader", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        t0 = time.perf_counter()
+        try:
+            backend = self._load_fn()
+            for shape in self._warmup_shapes:
+                backend.predict(np.zeros(shape, dtype=np.float32))
+            self.backend = backend
+        except Exception as e:
+            self.error = e
+        finally:
+            self.load_seconds = time.perf_counter() - t0
+            self._ready.set()
+
+    @property
+    def ready(self):
+        return self._ready.is_set() and self.error is None
+
+    @property
+    def failed(self):
+        return self._ready.is_set() and self.error is not None
+
+    def wait(self, timeout=None):
+        if not self._ready.wait(timeout):
+            raise TimeoutError("Model belum selesai dimuat.")
+        if self.error is not None:
+            raise RuntimeError(f"Model gagal dimuat: {self.error}") from self.error
+        return self.backend
+
+
+class _Request:
+    __slots__ = ("x", "future", "t_masuk")
+
+    def __init__(self, x):
+        self.x = x
+        self.future = Future()
+        self.t_masuk = time.perf_counter()
+
+
+class BatchingEngine:
+    def __init__(self, predict_fn, max_batch_size=16, max_latency_ms=10,
+                 max_queue=256, latency_window=1000):
+        # predict_fn menerima array (N, 299, 299, 3) dan mengembalikan (N, kelas)
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency_ms / 1000.0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        # Buffer input batch dialokasikan sekali (saat batch pertama) lalu dipakai ulang
+        self._buffer = None
+
+        # --- Metrik ---
+        self._batch_sizes = Counter()
+        self._latencies = deque(maxlen=latency_window)
+        self._jumlah_request = 0
+        self._jumlah_batch = 0
+        self._jumlah_error = 0
+
+        self._worker = threading.Thread(target=self._loop, name="batching-engine", daemon=True)
+        self._worker.start()
+
+    # ----------------------
+    # API untuk pemanggil
+    # ----------------------
+    def submit(self, x):
+        # x boleh berbentuk (299, 299, 3) atau (1, 299, 299, 3)
+        if self._stopped.is_set():
+            raise EngineStopped("Mesin inferensi sudah dihentikan.")
+        if x.ndim == 4:
+            if x.shape[0] != 1:
+                raise ValueError("submit() hanya menerima satu gambar; gunakan predict_many() untuk banyak gambar.")
+            x = x[0]
+        req = _Request(x)
+        self._queue.put(req)
+        return req.future
+
+    def predict(self, x, timeout=None):
+        return self.submit(x).result(timeout=timeout)
+
+    def predict_many(self, xs, timeout=None):
+        futures = [self.submit(x) for x in xs]
+        return np.stack([f.result(timeout=timeout) for f in futures])
+
+    def stop(self, timeout=5.0):
+        self._stopped.set()
+        self._worker.join(timeout=timeout)
+        # Gagalkan permintaan yang tersisa agar pemanggil tidak menunggu selamanya
+        while True:
+            try:
+                req = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            req.future.set_exception(EngineStopped("Mesin inferensi sudah dihentikan."))
+
+    # ----------------------
+    # Metrik
+    # ----------------------
+    def stats(self):
+        with self._lock:
+            latencies = np.array(self._latencies) * 1000.0
+            batch_sizes = dict(sorted(self._batch_sizes.items()))
+            jumlah_batch = self._jumlah_batch
+            jumlah_request = self._jumlah_request
+            jumlah_error = self._jumlah_error
+
+        hasil = {
+            "queue_depth": self._queue.qsize(),
+            "requests": jumlah_request,
+            "batches": jumlah_batch,
+            "errors": jumlah_error,
+            "avg_batch_size": (jumlah_request / jumlah_batch) if jumlah_batch else 0.0,
+            "batch_size_histogram": batch_sizes,
+        }
+        if latencies.size:
+            hasil["latency_ms"] = {
+                "p50": float(np.percentile(latencies, 50)),
+                "p95": float(np.percentile(latencies, 95)),
+                "p99": float(np.percentile(latencies, 99)),
+            }
+        return hasil
+
+    # ----------------------
+    # Loop pekerja
+    # ----------------------
+    def _collect_batch(self):
+        # Tunggu permintaan pertama, lalu kumpulkan sisanya sampai batch penuh
+        # atau tenggat waktu dari permintaan pertama habis.
+        try:
+            pertama = self._queue.get(timeout=0.1)
+        except queue.Empty:
+            return []
+        batch = [pertama]
+        tenggat = pertama.t_masuk + self.max_latency
+        while len(batch) < self.max_batch_size:
+            sisa = tenggat - time.perf_counter()
+            try:
+                if sisa <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=sisa))
+            except queue.Empty:
+                break
+        return batch
+
+    def _stack(self, batch):
+        contoh = batch[0].x
+        if self._buffer is None or self._buffer.shape[1:] != contoh.shape:
+            self._buffer = np.empty((self.max_batch_size,) + contoh.shape, dtype=np.float32)
+        return np.stack([req.x for req in batch], out=self._buffer[:len(batch)])
+
+    def _loop(self):
+        while not self._stopped.is_set():
+            batch = self._collect_batch()
+            # Lewati permintaan yang sudah dibatalkan pemanggilnya
+            batch = [req for req in batch if req.future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            try:
+                x = self._stack(batch)
+                preds = np.asarray(self.predict_fn(x))
+            except Exception as e:
+                with self._lock:
+                    self._jumlah_error += len(batch)
+                for req in batch:
+                    req.future.set_exception(e)
+                continue
+
+            selesai = time.perf_counter()
+            for req, pred in zip(batch, preds):
+                req.future.set_result(pred)
+
+            with self._lock:
+                self._jumlah_batch += 1
+                self._jumlah_request += len(batch)
+                self._batch_sizes[len(batch)] += 1
+                self._latencies.extend(selesai - req.t_masuk for req in batch)
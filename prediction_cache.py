@@ -0,0 +1,183 @@
+# ======================
+# Cache Prediksi Berbasis Isi Gambar
+# ======================
+# Petani sering mengunggah foto yang sama berkali-kali. Kunci cache adalah
+# hash dari piksel hasil decode (bukan nama file) ditambah versi model, dan
+# nilai yang disimpan adalah seluruh vektor probabilitas, sehingga grafik
+# keyakinan tetap bisa dibuat ulang tanpa inferensi.
+#
+# Dua tingkat:
+#   1. LRU di memori (dibagi semua sesi Streamlit)
+#   2. Opsional: file .npy di disk, bertahan setelah server di-restart.
+#      Jumlah file dibatasi disk_capacity; jika terlampaui, file dengan mtime
+#      paling lama dihapus (hit disk memperbarui mtime, jadi urutannya LRU).
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def model_version(model_path):
+    # Cukup dari ukuran + waktu modifikasi: berubah setiap file model diganti
+    st = os.stat(model_path)
+    sumber = f"{os.path.basename(model_path)}:{st.st_size}:{int(st.st_mtime)}"
+    return hashlib.blake2b(sumber.encode(), digest_size=8).hexdigest()
+
+
+def image_key(img, version=""):
+    h = hashlib.blake2b(digest_size=20)
+    h.update(f"{version}|{img.mode}|{img.size[0]}x{img.size[1]}|".encode())
+    h.update(img.tobytes())
+    return h.hexdigest()
+
+
+# Setelah pemangkasan, disk diisi sampai fraksi ini dari kapasitas agar
+# pemangkasan (yang memindai folder) tidak terjadi di setiap put
+SISA_SETELAH_PANGKAS = 0.9
+
+
+class PredictionCache:
+    def __init__(self, capacity=512, disk_dir=None, disk_capacity=20000):
+        self.capacity = capacity
+        self.disk_dir = disk_dir
+        self.disk_capacity = disk_capacity
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self._prune_lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.disk_evictions = 0
+        self._disk_count = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self._disk_count = len(self._disk_files())
+
+    # ----------------------
+    # Tingkat disk
+    # ----------------------
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], f"{key}.npy")
+
+    def _disk_files(self):
+        # Daftar (mtime, path) semua entri di disk
+        hasil = []
+        with os.scandir(self.disk_dir) as folders:
+            for folder in folders:
+                if not folder.is_dir():
+                    continue
+                with os.scandir(folder.path) as entries:
+                    for entry in entries:
+                        if not entry.name.endswith(".npy"):
+                            continue
+                        try:
+                            hasil.append((entry.stat().st_mtime, entry.path))
+                        except OSError:
+                            continue
+        return hasil
+
+    def _disk_get(self, key):
+        path = self._disk_path(key)
+        try:
+            probabilities = np.load(path)
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return probabilities
+
+    def _disk_put(self, key, probabilities):
+        path = self._disk_path(key)
+        baru = not os.path.exists(path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Tulis ke file sementara lalu rename agar pembaca tidak melihat file setengah jadi
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, probabilities)
+        os.replace(tmp, path)
+        if baru:
+            with self._lock:
+                self._disk_count += 1
+                penuh = self._disk_count > self.disk_capacity
+            if penuh:
+                self._prune_disk()
+
+    def _prune_disk(self):
+        # Hapus file paling lama; cukup satu thread yang memangkas
+        if not self._prune_lock.acquire(blocking=False):
+            return
+        try:
+            files = sorted(self._disk_files())
+            lebih = len(files) - int(self.disk_capacity * SISA_SETELAH_PANGKAS)
+            dihapus = 0
+            for _, path in files[:max(lebih, 0)]:
+                try:
+                    os.remove(path)
+                    dihapus += 1
+                except FileNotFoundError:
+                    continue
+            with self._lock:
+                self._disk_count = len(files) - dihapus
+                self.disk_evictions += dihapus
+        finally:
+            self._prune_lock.release()
+
+    # ----------------------
+    # API
+    # ----------------------
+    def get(self, key):
+        with self._lock:
+            probabilities = self._items.get(key)
+            if probabilities is not None:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return probabilities.copy()
+
+        if self.disk_dir:
+            probabilities = self._disk_get(key)
+            if probabilities is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                    self._remember(key, probabilities)
+                return probabilities.copy()
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, probabilities):
+        probabilities = np.array(probabilities, dtype=np.float32)
+        with self._lock:
+            self._remember(key, probabilities)
+        if self.disk_dir:
+            try:
+                self._disk_put(key, probabilities)
+            except OSError:
+                # Cache disk hanya optimasi; kegagalan menulis tidak boleh menggagalkan deteksi
+                pass
+
+    def _remember(self, key, probabilities):
+        self._items[key] = probabilities
+        self._items.move_to_end(key)
+        while len(self._items) > self.capacity:
+            self._items.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.disk_hits + self.misses
+            hasil = {
+                "size": len(self._items),
+                "capacity": self.capacity,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": ((self.hits + self.disk_hits) / total) if total else 0.0,
+            }
+            if self.disk_dir:
+                hasil.update(disk_size=self._disk_count, disk_capacity=self.disk_capacity,
+                             disk_evictions=self.disk_evictions)
+            return hasil
@@ -0,0 +1,180 @@
+# ======================
+# Praproses Gambar
+# ======================
+# Praproses yang sama untuk semua jalur deteksi (aplikasi web dan CLI):
+# resize ke 299x299, ubah ke array, lalu normalisasi ke rentang 0-1.
+#
+# Foto dari HP bisa berukuran belasan megapiksel, padahal model hanya butuh
+# 299x299. Karena itu:
+#   1. JPEG di-decode dalam mode draft (libjpeg langsung mengecilkan 1/2, 1/4
+#      atau 1/8 saat decode), sehingga gambar penuh tidak pernah dibentuk.
+#   2. Resize menghasilkan array uint8 kecil, lalu konversi ke float32 dan
+#      pembagian 255 dilakukan dalam satu operasi langsung ke buffer tujuan
+#      (tanpa array float64 sementara).
+#   3. Untuk batch, buffer float32 dialokasikan sekali dan dipakai ulang.
+#
+# Benchmark (tanpa model):
+#   python preprocessing.py --bench
+import os
+
+import numpy as np
+from PIL import Image
+
+from config import EKSTENSI_GAMBAR, FOLDER_SAMPEL, IMG_SIZE
+
+# Ukuran minimum untuk gambar yang ditampilkan/disimpan di aplikasi web;
+# decode draft tetap menjaga sisi gambar >= ukuran ini.
+PREVIEW_SIZE = (1024, 1024)
+
+SKALA = np.float32(1.0 / 255.0)
+
+# reducing_gap membuat Pillow mengecilkan gambar besar dengan reduce() yang
+# murah terlebih dahulu sebelum resampling bicubic
+REDUCING_GAP = 3.0
+
+
+def load_image(fp, draft_size=IMG_SIZE):
+    # fp boleh berupa path atau objek file (mis. hasil st.file_uploader).
+    # draft_size=None berarti decode resolusi penuh.
+    img = Image.open(fp)
+    if draft_size is not None and img.format == "JPEG":
+        img.draft('RGB', draft_size)
+    return img.convert('RGB')
+
+
+def resize_to_array(img, size=IMG_SIZE):
+    # Hasil: array uint8 (H, W, 3)
+    if img.size != size:
+        img = img.resize(size, reducing_gap=REDUCING_GAP)
+    return np.asarray(img, dtype=np.uint8)
+
+
+def normalize_into(arr, out):
+    # uint8 -> float32 / 255 dalam satu operasi, ditulis langsung ke `out`
+    np.multiply(arr, SKALA, out=out, dtype=np.float32)
+    return out
+
+
+def preprocess_into(img, out):
+    return normalize_into(resize_to_array(img), out)
+
+
+def preprocess_image(img):
+    out = np.empty((IMG_SIZE[1], IMG_SIZE[0], 3), dtype=np.float32)
+    return preprocess_into(img, out)
+
+
+def decode_resized(fp, size=IMG_SIZE):
+    # Jalur tercepat dari file ke array uint8 siap-normalisasi; aman dipanggil
+    # dari thread pool karena Pillow melepas GIL saat decode dan resize.
+    with Image.open(fp) as img:
+        if img.format == "JPEG":
+            img.draft('RGB', size)
+        return resize_to_array(img.convert('RGB'), size)
+
+
+def list_images(folders=FOLDER_SAMPEL, recursive=False):
+    # Path gambar terurut per folder; folder yang tidak ada dilewati
+    paths = []
+    for folder in folders:
+        if not os.path.isdir(folder):
+            continue
+        for akar, subdirs, files in os.walk(folder):
+            subdirs.sort()
+            if not recursive:
+                subdirs.clear()
+            paths += [os.path.join(akar, nama) for nama in sorted(files)
+                      if nama.lower().endswith(EKSTENSI_GAMBAR)]
+    return paths
+
+
+def iter_decoded(paths, size=IMG_SIZE):
+    # (path, array uint8) untuk setiap gambar yang bisa di-decode
+    for path in paths:
+        try:
+            yield path, decode_resized(path, size)
+        except OSError:
+            # mis. file masih berupa pointer Git LFS
+            continue
+
+
+class BatchBuffer:
+    # Buffer float32 (kapasitas, H, W, 3) yang dipakai ulang antar batch
+    def __init__(self, capacity, size=IMG_SIZE):
+        self.capacity = capacity
+        self.data = np.empty((capacity, size[1], size[0], 3), dtype=np.float32)
+
+    def put(self, i, arr):
+        # arr: uint8 (H, W, 3) dari decode_resized()/resize_to_array()
+        normalize_into(arr, self.data[i])
+
+    def put_image(self, i, img):
+        preprocess_into(img, self.data[i])
+
+    def view(self, n):
+        return self.data[:n]
+
+
+# ======================
+# Benchmark
+# ======================
+def _legacy_preprocess(fp):
+    # Jalur lama di app.py: decode penuh, resize, img_to_array, /255.0
+    img = Image.open(fp).convert('RGB')
+    img = img.resize(IMG_SIZE)
+    x = np.asarray(img, dtype=np.float32)
+    return np.expand_dims(x, axis=0) / 255.0
+
+
+def synthetic_jpeg(width, height, seed=0):
+    import io
+    rng = np.random.default_rng(seed)
+    # Gradien + noise agar ukuran JPEG mendekati foto asli
+    gradien = np.linspace(0, 255, width, dtype=np.float32)[None, :, None]
+    data = (gradien + rng.normal(0, 25, (height, width, 3))).clip(0, 255).astype(np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(data).save(buf, format="JPEG", quality=90)
+    return buf.getvalue()
+
+
+def benchmark(resolutions=((640, 480), (1920, 1080), (4000, 3000)), repeat=10, batch_size=8):
+    import io
+    import time
+
+    hasil = []
+    buffer = BatchBuffer(batch_size)
+    for width, height in resolutions:
+        data = synthetic_jpeg(width, height)
+
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            _legacy_preprocess(io.BytesIO(data))
+        legacy_ms = (time.perf_counter() - t0) / repeat * 1000
+
+        t0 = time.perf_counter()
+        for i in range(repeat):
+            buffer.put(i % batch_size, decode_resized(io.BytesIO(data)))
+        baru_ms = (time.perf_counter() - t0) / repeat * 1000
+
+        hasil.append({
+            "resolusi": f"{width}x{height}",
+            "lama_ms": round(legacy_ms, 2),
+            "baru_ms": round(baru_ms, 2),
+            "percepatan": round(legacy_ms / baru_ms, 2) if baru_ms else None,
+        })
+    return hasil
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Benchmark praproses gambar (tanpa model).")
+    parser.add_argument("--bench", action="store_true", help="Jalankan benchmark")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+    if args.bench:
+        for baris in benchmark(repeat=args.repeat):
+            print(json.dumps(baris))
+    else:
+        parser.print_help()
@@ -0,0 +1,297 @@
+# ======================
+# Inferensi Multi-Proses dengan Replika Model per Pekerja
+# ======================
+# Satu proses Python hanya bisa memakai sebagian core untuk decode,
+# praproses dan inferensi. Mode ini menjalankan N proses pekerja yang
+# masing-masing memuat model sendiri, dengan jumlah thread intra-op per
+# pekerja dibatasi (core / N) agar tidak terjadi oversubscription.
+#
+# Data gambar tidak di-pickle: setiap pekerja punya blok shared memory untuk
+# input (batch float32) dan output (probabilitas). Proses induk menulis
+# langsung ke blok input, lalu hanya mengirim jumlah gambar lewat pipe.
+#
+#   pool = ProcessPoolInference(n_workers=4)          # atau auto_configure(...)
+#   probs = pool.predict_arrays(list_array_uint8)     # aman dari banyak thread
+#   pool.close()
+#
+# Pekerja yang mati mendadak (OOM, segfault) diganti dengan proses baru;
+# batch yang sedang dikerjakan pekerja itu gagal dengan WorkerError.
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from multiprocessing import get_context, shared_memory
+
+import numpy as np
+
+from config import IMG_SIZE, idx_to_class
+from preprocessing import normalize_into
+
+JUMLAH_KELAS = len(idx_to_class)
+THREAD_PER_PEKERJA_DEFAULT = 2
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerError(RuntimeError):
+    pass
+
+
+def default_worker_count(threads_per_worker=THREAD_PER_PEKERJA_DEFAULT):
+    return max(1, (os.cpu_count() or 1) // threads_per_worker)
+
+
+# ======================
+# Sisi Pekerja
+# ======================
+def _worker_main(conn, shm_in_name, shm_out_name, max_batch_size, backend_name, num_threads):
+    # Batasi thread runtime sebelum runtime diimpor
+    for var in ("OMP_NUM_THREADS", "TF_NUM_INTRAOP_THREADS", "MKL_NUM_THREADS"):
+        os.environ[var] = str(num_threads)
+    os.environ["TF_NUM_INTEROP_THREADS"] = "1"
+
+    shm_in = shared_memory.SharedMemory(name=shm_in_name)
+    shm_out = shared_memory.SharedMemory(name=shm_out_name)
+    try:
+        inp = np.ndarray((max_batch_size, IMG_SIZE[1], IMG_SIZE[0], 3), dtype=np.float32, buffer=shm_in.buf)
+        out = np.ndarray((max_batch_size, JUMLAH_KELAS), dtype=np.float32, buffer=shm_out.buf)
+        try:
+            from backends import load_backend
+            backend = load_backend(backend_name, num_threads=num_threads)
+            backend.predict(inp[:1])  # pemanasan
+        except Exception as e:
+            conn.send(("error", repr(e)))
+            return
+        conn.send(("ready", backend.name))
+
+        while True:
+            n = conn.recv()
+            if n is None:
+                break
+            try:
+                out[:n] = backend.predict(inp[:n])
+                conn.send(("ok", n))
+            except Exception as e:
+                conn.send(("error", repr(e)))
+        # Lepaskan view sebelum shared memory ditutup
+        del inp, out
+    finally:
+        shm_in.close()
+        shm_out.close()
+
+
+# ======================
+# Sisi Induk
+# ======================
+class _Worker:
+    def __init__(self, ctx, index, max_batch_size, backend_name, num_threads):
+        self.index = index
+        self.processed = 0
+        self.dead = False
+        ukuran_in = max_batch_size * IMG_SIZE[0] * IMG_SIZE[1] * 3 * 4
+        ukuran_out = max_batch_size * JUMLAH_KELAS * 4
+        self.shm_in = shared_memory.SharedMemory(create=True, size=ukuran_in)
+        self.shm_out = shared_memory.SharedMemory(create=True, size=ukuran_out)
+        self.input = np.ndarray((max_batch_size, IMG_SIZE[1], IMG_SIZE[0], 3), dtype=np.float32, buffer=self.shm_in.buf)
+        self.output = np.ndarray((max_batch_size, JUMLAH_KELAS), dtype=np.float32, buffer=self.shm_out.buf)
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(child_conn, self.shm_in.name, self.shm_out.name, max_batch_size, backend_name, num_threads),
+            name=f"inferensi-{index}",
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+
+    def wait_ready(self, timeout):
+        try:
+            if not self.conn.poll(timeout):
+                raise WorkerError(f"Pekerja {self.index} tidak siap dalam {timeout} detik")
+            status, info = self.conn.recv()
+        except (EOFError, OSError) as e:
+            self.dead = True
+            raise WorkerError(f"Pekerja {self.index} berhenti saat memuat model "
+                              f"(exitcode {self.process.exitcode})") from e
+        if status != "ready":
+            raise WorkerError(f"Pekerja {self.index} gagal memuat model: {info}")
+        return info
+
+    def run(self, n):
+        try:
+            self.conn.send(n)
+            status, info = self.conn.recv()
+        except (EOFError, OSError) as e:
+            # Proses pekerja mati di tengah batch; pipe tertutup dari sisi lain
+            self.dead = True
+            self.process.join(1.0)
+            raise WorkerError(f"Pekerja {self.index} berhenti mendadak "
+                              f"(exitcode {self.process.exitcode})") from e
+        if status != "ok":
+            raise WorkerError(f"Pekerja {self.index}: {info}")
+        self.processed += n
+        return self.output[:n].copy()
+
+    def close(self, timeout=5.0):
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.conn.close()
+        del self.input, self.output
+        for shm in (self.shm_in, self.shm_out):
+            shm.close()
+            shm.unlink()
+
+
+class ProcessPoolInference:
+    def __init__(self, n_workers=None, max_batch_size=16, backend_name=None,
+                 threads_per_worker=None, start_timeout=300.0):
+        cpu = os.cpu_count() or 1
+        self.n_workers = n_workers or default_worker_count(threads_per_worker or THREAD_PER_PEKERJA_DEFAULT)
+        self.threads_per_worker = threads_per_worker or max(1, cpu // self.n_workers)
+        self.max_batch_size = max_batch_size
+        self.restarts = 0
+        self._backend_name = backend_name
+        self._start_timeout = start_timeout
+
+        ctx = self._ctx = get_context("spawn")
+        self._workers = []
+        try:
+            for i in range(self.n_workers):
+                self._workers.append(_Worker(ctx, i, max_batch_size, backend_name, self.threads_per_worker))
+            # Semua pekerja memuat model secara paralel; tunggu setelah semuanya dimulai
+            self.backend_name = [w.wait_ready(start_timeout) for w in self._workers][0]
+        except Exception:
+            for w in self._workers:
+                w.close()
+            raise
+
+        self._idle = queue.Queue()
+        for w in self._workers:
+            self._idle.put(w)
+        self._closed = False
+
+    @contextmanager
+    def _lease(self):
+        while True:
+            try:
+                worker = self._idle.get(timeout=1.0)
+                break
+            except queue.Empty:
+                if not self._workers:
+                    raise WorkerError("Semua pekerja berhenti dan tidak bisa dijalankan ulang")
+        try:
+            yield worker
+        finally:
+            if worker.dead:
+                worker = self._replace(worker)
+            if worker is not None:
+                self._idle.put(worker)
+
+    def _replace(self, worker):
+        # Pekerja mati tidak dikembalikan ke antrean; coba jalankan proses baru
+        # di slot yang sama. None jika gagal (pool berjalan dengan pekerja tersisa).
+        worker.close(timeout=1.0)
+        posisi = self._workers.index(worker)
+        try:
+            baru = _Worker(self._ctx, worker.index, self.max_batch_size, self._backend_name,
+                           self.threads_per_worker)
+            try:
+                baru.wait_ready(self._start_timeout)
+            except Exception:
+                baru.close()
+                raise
+        except Exception:
+            logger.exception("Pekerja %d tidak bisa dijalankan ulang", worker.index)
+            del self._workers[posisi]
+            return None
+        self._workers[posisi] = baru
+        self.restarts += 1
+        return baru
+
+    def predict_arrays(self, arrays):
+        # arrays: daftar uint8 (H, W, 3) hasil decode_resized(); dinormalisasi
+        # langsung ke shared memory pekerja tanpa salinan perantara.
+        hasil = []
+        for mulai in range(0, len(arrays), self.max_batch_size):
+            potongan = arrays[mulai:mulai + self.max_batch_size]
+            with self._lease() as worker:
+                for i, arr in enumerate(potongan):
+                    normalize_into(arr, worker.input[i])
+                hasil.append(worker.run(len(potongan)))
+        return np.concatenate(hasil) if hasil else np.empty((0, JUMLAH_KELAS), dtype=np.float32)
+
+    def stats(self):
+        return {
+            "workers": self.n_workers,
+            "alive": len(self._workers),
+            "restarts": self.restarts,
+            "threads_per_worker": self.threads_per_worker,
+            "idle": self._idle.qsize(),
+            "processed": [w.processed for w in self._workers],
+        }
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        for w in self._workers:
+            w.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ======================
+# Penentuan Jumlah Pekerja Otomatis
+# ======================
+def measure_throughput(pool, sample_arrays, seconds=5.0):
+    # Semua pekerja dibuat sibuk sekaligus dengan satu thread pengirim per pekerja
+    berhenti = time.perf_counter() + seconds
+    jumlah = [0] * pool.n_workers
+
+    def kirim(i):
+        while time.perf_counter() < berhenti:
+            pool.predict_arrays(sample_arrays)
+            jumlah[i] += len(sample_arrays)
+
+    t0 = time.perf_counter()
+    threads = [threading.Thread(target=kirim, args=(i,)) for i in range(pool.n_workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return sum(jumlah) / (time.perf_counter() - t0)
+
+
+def auto_configure(sample_arrays, max_batch_size=16, backend_name=None, candidates=None,
+                   seconds=5.0, log=None):
+    # Mencoba beberapa jumlah pekerja (core dibagi rata), mempertahankan pool
+    # dengan throughput terbaik dan menutup sisanya.
+    cpu = os.cpu_count() or 1
+    if candidates is None:
+        candidates = sorted({1, max(1, cpu // 4), max(1, cpu // 2), default_worker_count()})
+    sample_arrays = list(sample_arrays)[:max_batch_size]
+
+    terbaik, laju_terbaik = None, -1.0
+    for n in candidates:
+        pool = ProcessPoolInference(n, max_batch_size, backend_name)
+        laju = measure_throughput(pool, sample_arrays, seconds)
+        if log:
+            log(f"{n} pekerja x {pool.threads_per_worker} thread: {laju:.1f} gambar/detik")
+        if laju > laju_terbaik:
+            if terbaik is not None:
+                terbaik.close()
+            terbaik, laju_terbaik = pool, laju
+        else:
+            pool.close()
+    return terbaik, laju_terbaik
@@ -0,0 +1,176 @@
+# ======================
+# Statistik Deteksi (Agregat Inkremental)
+# ======================
+# Dashboard statistik tidak memindai ulang riwayat_upload atau tabel
+# riwayat. Setiap deteksi (termasuk "Model Ragu" dan "bukan ikan") langsung
+# menambah beberapa baris agregat kecil di SQLite:
+#   stat_harian    : jumlah & total keyakinan per (tanggal, status, label)
+#   stat_keyakinan : histogram keyakinan per label (10 bucket @ 10%)
+# sehingga ukuran yang dibaca dashboard sebanding dengan jumlah hari, bukan
+# jumlah deteksi.
+import sqlite3
+import threading
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from config import HISTORY_DB, STATUS_BUKAN_IKAN, STATUS_RAGU, STATUS_VALID
+
+JUMLAH_BUCKET = 10
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS stat_harian (
+    tanggal TEXT NOT NULL,
+    status TEXT NOT NULL,
+    label TEXT NOT NULL,
+    jumlah INTEGER NOT NULL DEFAULT 0,
+    total_keyakinan REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (tanggal, status, label)
+);
+CREATE TABLE IF NOT EXISTS stat_keyakinan (
+    label TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    jumlah INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (label, bucket)
+);
+"""
+
+
+def confidence_bucket(confidence):
+    return min(int(confidence * JUMLAH_BUCKET), JUMLAH_BUCKET - 1)
+
+
+class StatsAggregator:
+    def __init__(self, db_path=HISTORY_DB):
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # ----------------------
+    # Pembaruan per deteksi
+    # ----------------------
+    def record(self, label, confidence, status, waktu=None):
+        waktu = waktu or datetime.now()
+        confidence = float(confidence)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO stat_harian (tanggal, status, label, jumlah, total_keyakinan) "
+                "VALUES (?, ?, ?, 1, ?) "
+                "ON CONFLICT (tanggal, status, label) DO UPDATE SET "
+                "jumlah = jumlah + 1, total_keyakinan = total_keyakinan + excluded.total_keyakinan",
+                (waktu.date().isoformat(), status, label, confidence),
+            )
+            self._conn.execute(
+                "INSERT INTO stat_keyakinan (label, bucket, jumlah) VALUES (?, ?, 1) "
+                "ON CONFLICT (label, bucket) DO UPDATE SET jumlah = jumlah + 1",
+                (label, confidence_bucket(confidence)),
+            )
+
+    def is_empty(self):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM stat_harian LIMIT 1").fetchone() is None
+
+    def backfill_from_history(self):
+        # Sekali jalan: isi agregat dari tabel riwayat yang sudah ada (semuanya
+        # deteksi valid; hasil ragu/bukan ikan sebelumnya memang tidak tercatat)
+        with self._lock, self._conn:
+            ada = self._conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'riwayat'"
+            ).fetchone()
+            if not ada:
+                return 0
+            rows = self._conn.execute(
+                "SELECT substr(waktu, 1, 10), label, COUNT(*), COALESCE(SUM(confidence), 0) "
+                "FROM riwayat GROUP BY 1, 2"
+            ).fetchall()
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO stat_harian (tanggal, status, label, jumlah, total_keyakinan) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(tanggal, STATUS_VALID, label, n, total) for tanggal, label, n, total in rows],
+            )
+            buckets = self._conn.execute(
+                f"SELECT label, MIN(CAST(confidence * {JUMLAH_BUCKET} AS INTEGER), {JUMLAH_BUCKET - 1}), COUNT(*) "
+                "FROM riwayat WHERE confidence IS NOT NULL GROUP BY 1, 2"
+            ).fetchall()
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO stat_keyakinan (label, bucket, jumlah) VALUES (?, ?, ?)",
+                buckets,
+            )
+            return sum(n for _, _, n, _ in rows)
+
+    # ----------------------
+    # Kueri dashboard
+    # ----------------------
+    def summary(self):
+        with self._lock:
+            per_status = dict(self._conn.execute(
+                "SELECT status, SUM(jumlah) FROM stat_harian GROUP BY status"
+            ).fetchall())
+            teratas = self._conn.execute(
+                "SELECT label, SUM(jumlah) AS n FROM stat_harian WHERE status = ? "
+                "GROUP BY label ORDER BY n DESC LIMIT 1",
+                (STATUS_VALID,),
+            ).fetchone()
+            rata = self._conn.execute(
+                "SELECT SUM(total_keyakinan), SUM(jumlah) FROM stat_harian WHERE status = ?",
+                (STATUS_VALID,),
+            ).fetchone()
+
+        total = sum(per_status.values())
+        return {
+            "total": total,
+            "valid": per_status.get(STATUS_VALID, 0),
+            "ragu": per_status.get(STATUS_RAGU, 0),
+            "bukan_ikan": per_status.get(STATUS_BUKAN_IKAN, 0),
+            "rasio_ragu": per_status.get(STATUS_RAGU, 0) / total if total else 0.0,
+            "rasio_bukan_ikan": per_status.get(STATUS_BUKAN_IKAN, 0) / total if total else 0.0,
+            "label_terbanyak": teratas[0] if teratas else None,
+            "rata_keyakinan_valid": (rata[0] / rata[1]) if rata and rata[1] else None,
+        }
+
+    def daily(self, days=30, status=None):
+        # Daftar (tanggal, status, label, jumlah, rata_keyakinan) untuk N hari terakhir
+        mulai = (date.today() - timedelta(days=days - 1)).isoformat()
+        sql = ("SELECT tanggal, status, label, jumlah, total_keyakinan FROM stat_harian "
+               "WHERE tanggal >= ?")
+        params = [mulai]
+        if status:
+            sql += " AND status = ?"
+            params.append(status)
+        with self._lock:
+            rows = self._conn.execute(sql + " ORDER BY tanggal", params).fetchall()
+        return [
+            {"tanggal": tanggal, "status": st, "label": label, "jumlah": n,
+             "rata_keyakinan": total / n if n else 0.0}
+            for tanggal, st, label, n, total in rows
+        ]
+
+    def weekly(self, weeks=12, status=STATUS_VALID):
+        # Dijumlahkan dari agregat harian (paling banyak 7 x weeks baris per label)
+        per_minggu = defaultdict(int)
+        for row in self.daily(days=weeks * 7, status=status):
+            tahun, minggu, _ = date.fromisoformat(row["tanggal"]).isocalendar()
+            per_minggu[(f"{tahun}-W{minggu:02d}", row["label"])] += row["jumlah"]
+        return [
+            {"minggu": minggu, "label": label, "jumlah": n}
+            for (minggu, label), n in sorted(per_minggu.items())
+        ]
+
+    def confidence_histogram(self, label=None):
+        sql = "SELECT bucket, SUM(jumlah) FROM stat_keyakinan"
+        params = []
+        if label:
+            sql += " WHERE label = ?"
+            params.append(label)
+        with self._lock:
+            rows = dict(self._conn.execute(sql + " GROUP BY bucket", params).fetchall())
+        return [
+            {"rentang": f"{b * 100 // JUMLAH_BUCKET}-{(b + 1) * 100 // JUMLAH_BUCKET}%", "jumlah": rows.get(b, 0)}
+            for b in range(JUMLAH_BUCKET)
+        ]
@@ -0,0 +1,48 @@
+# ======================
+# Thumbnail Riwayat
+# ======================
+# Halaman Riwayat menampilkan thumbnail kecil, bukan JPEG resolusi penuh.
+# Thumbnail dibuat sekali saat deteksi disimpan, atau saat pertama kali
+# dilihat untuk gambar lama yang belum punya thumbnail.
+import os
+
+from PIL import Image
+
+from config import THUMBNAIL_DIR, THUMBNAIL_SIZE
+
+
+def thumbnail_path(image_path):
+    nama = os.path.splitext(os.path.basename(image_path))[0]
+    return os.path.join(THUMBNAIL_DIR, f"{nama}.jpg")
+
+
+def save_thumbnail(img, image_path):
+    # img: gambar PIL yang sudah ada di memori (saat deteksi), tidak diubah
+    path = thumbnail_path(image_path)
+    os.makedirs(THUMBNAIL_DIR, exist_ok=True)
+    thumb = img.copy()
+    thumb.thumbnail(THUMBNAIL_SIZE)
+    thumb.convert('RGB').save(path, format="JPEG", quality=80)
+    return path
+
+
+def ensure_thumbnail(image_path):
+    # Mengembalikan path thumbnail, membuatnya dari file asli jika belum ada.
+    # None jika file asli tidak bisa dibaca.
+    path = thumbnail_path(image_path)
+    if os.path.exists(path):
+        return path
+    try:
+        with Image.open(image_path) as img:
+            if img.format == "JPEG":
+                img.draft('RGB', THUMBNAIL_SIZE)
+            return save_thumbnail(img, image_path)
+    except OSError:
+        return None
+
+
+def remove_thumbnail(image_path):
+    try:
+        os.remove(thumbnail_path(image_path))
+    except FileNotFoundError:
+        pass
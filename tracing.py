@@ -0,0 +1,144 @@
+# ======================
+# Pencatatan Waktu per Tahap
+# ======================
+# Tracer ringan untuk jalur deteksi. Setiap permintaan membuat satu Trace,
+# setiap tahap dibungkus `with trace.stage("nama"):`, dan durasinya masuk ke
+# histogram bergulir di memori (per tahap). Data bisa diekspor sebagai teks
+# Prometheus atau file JSON.
+#
+#   trace = tracer.start()
+#   with trace.stage("decode"):
+#       ...
+#   trace.finish()
+#
+# Tahap ditampung di Trace dan baru masuk histogram saat finish(), sehingga
+# jumlah per tahap selalu sebanding dengan "total". Trace yang tidak pernah
+# selesai (mis. rerun Streamlit tanpa deteksi) tidak tercatat.
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+# Batas bucket histogram Prometheus (detik)
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class StageHistogram:
+    def __init__(self, window=1000):
+        self.count = 0
+        self.total = 0.0
+        self.bucket_counts = [0] * len(BUCKETS)
+        # Jendela bergulir untuk persentil terbaru
+        self.recent = deque(maxlen=window)
+
+    def observe(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.recent.append(seconds)
+        for i, batas in enumerate(BUCKETS):
+            if seconds <= batas:
+                self.bucket_counts[i] += 1
+
+    def summary(self):
+        hasil = {"count": self.count, "total_s": round(self.total, 6)}
+        if self.recent:
+            arr = np.asarray(self.recent) * 1000
+            hasil.update({
+                "p50_ms": round(float(np.percentile(arr, 50)), 3),
+                "p95_ms": round(float(np.percentile(arr, 95)), 3),
+                "p99_ms": round(float(np.percentile(arr, 99)), 3),
+                "max_ms": round(float(arr.max()), 3),
+            })
+        return hasil
+
+
+class Trace:
+    def __init__(self, tracer):
+        self._tracer = tracer
+        self.t_mulai = time.perf_counter()
+        self.stages = []  # daftar (nama, detik)
+        self._selesai = False
+
+    @contextmanager
+    def stage(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - t0)
+
+    def record(self, name, seconds):
+        self.stages.append((name, seconds))
+
+    def finish(self):
+        if self._selesai:
+            return
+        self._selesai = True
+        for name, seconds in self.stages:
+            self._tracer.observe(name, seconds)
+        self._tracer.observe("total", time.perf_counter() - self.t_mulai)
+        self._tracer.finished(self)
+
+    def as_dict(self):
+        return {nama: round(detik * 1000, 3) for nama, detik in self.stages}
+
+
+class Tracer:
+    def __init__(self, window=1000, export_path=None, export_interval=30.0):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._window = window
+        self.last_trace = None
+        self.export_path = export_path
+        self.export_interval = export_interval
+        self._terakhir_ekspor = 0.0
+
+    def start(self):
+        return Trace(self)
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            hist = self._histograms.get(stage)
+            if hist is None:
+                hist = self._histograms[stage] = StageHistogram(self._window)
+            hist.observe(seconds)
+
+    def finished(self, trace):
+        self.last_trace = trace
+        if self.export_path and time.monotonic() - self._terakhir_ekspor >= self.export_interval:
+            self._terakhir_ekspor = time.monotonic()
+            try:
+                self.dump_json(self.export_path)
+            except OSError:
+                pass
+
+    # ----------------------
+    # Ekspor
+    # ----------------------
+    def snapshot(self):
+        with self._lock:
+            return {stage: hist.summary() for stage, hist in sorted(self._histograms.items())}
+
+    def to_prometheus(self, metric="ikancheck_stage_seconds"):
+        baris = [
+            f"# HELP {metric} Durasi tiap tahap deteksi dalam detik.",
+            f"# TYPE {metric} histogram",
+        ]
+        with self._lock:
+            for stage, hist in sorted(self._histograms.items()):
+                for batas, n in zip(BUCKETS, hist.bucket_counts):
+                    baris.append(f'{metric}_bucket{{stage="{stage}",le="{batas}"}} {n}')
+                baris.append(f'{metric}_bucket{{stage="{stage}",le="+Inf"}} {hist.count}')
+                baris.append(f'{metric}_sum{{stage="{stage}"}} {hist.total:.6f}')
+                baris.append(f'{metric}_count{{stage="{stage}"}} {hist.count}')
+        return "\n".join(baris) + "\n"
+
+    def dump_json(self, path):
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding='utf-8') as f:
+            json.dump({"waktu": time.time(), "stages": self.snapshot()}, f, indent=2)
+        os.replace(tmp, path)
@@ -0,0 +1,99 @@
+# ======================
+# Test-Time Augmentation (TTA)
+# ======================
+# Untuk gambar sulit, beberapa variasi gambar (flip, crop, kecerahan) dibuat
+# lalu dijalankan sebagai SATU batch predict, dan probabilitasnya dirata-rata.
+# Jumlah variasi dibatasi anggaran latensi: biaya per gambar diperkirakan
+# dari pemanggilan sebelumnya (rata-rata bergerak eksponensial).
+import threading
+import time
+
+import numpy as np
+from PIL import ImageEnhance, ImageOps
+
+from config import IMG_SIZE
+from preprocessing import BatchBuffer, resize_to_array
+
+# Gambar diperkecil sekali ke ukuran ini, lalu semua variasi dibuat darinya
+UKURAN_KERJA = (int(IMG_SIZE[0] * 1.12), int(IMG_SIZE[1] * 1.12))
+RASIO_CROP = 0.9
+
+
+def _crop(img, posisi):
+    w, h = img.size
+    cw, ch = int(w * RASIO_CROP), int(h * RASIO_CROP)
+    if posisi == "tengah":
+        left, top = (w - cw) // 2, (h - ch) // 2
+    elif posisi == "kiri_atas":
+        left, top = 0, 0
+    else:  # kanan_bawah
+        left, top = w - cw, h - ch
+    return img.crop((left, top, left + cw, top + ch))
+
+
+# Urutan penting: variasi paling informatif lebih dulu, karena anggaran
+# latensi bisa memotong daftar ini
+VIEWS = [
+    ("asli", lambda img: img),
+    ("flip_h", ImageOps.mirror),
+    ("crop_tengah", lambda img: _crop(img, "tengah")),
+    ("terang", lambda img: ImageEnhance.Brightness(img).enhance(1.15)),
+    ("gelap", lambda img: ImageEnhance.Brightness(img).enhance(0.85)),
+    ("crop_kiri_atas", lambda img: _crop(img, "kiri_atas")),
+    ("crop_kanan_bawah", lambda img: _crop(img, "kanan_bawah")),
+    ("flip_h_crop_tengah", lambda img: ImageOps.mirror(_crop(img, "tengah"))),
+]
+MAKS_VIEWS = len(VIEWS)
+
+
+class TTAPredictor:
+    def __init__(self, predict_fn, initial_ms_per_image=None, smoothing=0.3):
+        # predict_fn menerima batch float32 (N, 299, 299, 3)
+        self.predict_fn = predict_fn
+        self.ms_per_image = initial_ms_per_image
+        self.smoothing = smoothing
+        self._lock = threading.Lock()
+
+    def plan_views(self, n_views, latency_budget_ms=None):
+        n_views = max(1, min(n_views, MAKS_VIEWS))
+        if latency_budget_ms is None or self.ms_per_image is None:
+            return n_views
+        return max(1, min(n_views, int(latency_budget_ms // self.ms_per_image)))
+
+    def predict(self, img, n_views=6, latency_budget_ms=None):
+        # Mengembalikan (probabilitas rata-rata, daftar nama variasi, waktu ms)
+        dasar = img.convert('RGB').resize(UKURAN_KERJA, reducing_gap=3.0)
+        n_views = max(1, min(n_views, MAKS_VIEWS))
+
+        if self.ms_per_image is None and latency_budget_ms is not None and n_views > 1:
+            # Belum ada perkiraan biaya: variasi pertama dijalankan sendiri untuk
+            # mengukurnya, lalu sisa anggaran menentukan jumlah variasi lainnya
+            preds, elapsed_ms = self._run(dasar, VIEWS[:1])
+            sisa = min(n_views - 1, int((latency_budget_ms - elapsed_ms) // self.ms_per_image))
+            if sisa > 0:
+                lanjutan, ms = self._run(dasar, VIEWS[1:1 + sisa])
+                preds = np.concatenate([preds, lanjutan])
+                elapsed_ms += ms
+        else:
+            preds, elapsed_ms = self._run(dasar, VIEWS[:self.plan_views(n_views, latency_budget_ms)])
+
+        return preds.mean(axis=0), [nama for nama, _ in VIEWS[:len(preds)]], elapsed_ms
+
+    def _run(self, dasar, views):
+        buffer = BatchBuffer(len(views))
+        for i, (_, transform) in enumerate(views):
+            buffer.put(i, resize_to_array(transform(dasar)))
+
+        t0 = time.perf_counter()
+        preds = np.asarray(self.predict_fn(buffer.view(len(views))))
+        elapsed_ms = (time.perf_counter() - t0) * 1000
+        self._update_cost(elapsed_ms / len(views))
+        return preds, elapsed_ms
+
+    def _update_cost(self, ms_per_image):
+        with self._lock:
+            if self.ms_per_image is None:
+                self.ms_per_image = ms_per_image
+            else:
+                self.ms_per_image += self.smoothing * (ms_per_image - self.ms_per_image)
+
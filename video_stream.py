@@ -0,0 +1,286 @@
+# ======================
+# Deteksi dari Video / Kamera
+# ======================
+# Kamera kolam mengirim aliran frame terus-menerus, jauh lebih banyak dari
+# yang perlu (dan sanggup) dianalisis. Alurnya:
+#   1. FrameReader membaca frame di thread latar belakang (OpenCV melepas GIL
+#      saat decode) dan hanya mengambil setiap N frame (sampling). Frame
+#      yang dilewati cukup di-grab(), tidak dikonversi.
+#   2. Untuk kamera / URL stream, N disesuaikan dengan kecepatan model yang
+#      terukur, dan frame lama dibuang jika pemroses tertinggal, sehingga
+#      hasil selalu mengikuti waktu nyata. File video tidak pernah dibuang
+#      framenya (hasil bisa diulang).
+#   3. VideoDetector mengambil frame per batch, menjalankan satu forward pass,
+#      lalu menghaluskan probabilitas per frame dengan EMA menjadi satu
+#      putusan bergulir.
+#
+#   python video_stream.py kolam.mp4
+#   python video_stream.py 0 --max-seconds 60             # kamera pertama
+#   python video_stream.py rtsp://192.168.1.10/stream --output hasil.jsonl
+import argparse
+import json
+import math
+import os
+import sys
+import threading
+import time
+from collections import deque, namedtuple
+
+import cv2
+import numpy as np
+
+from config import (IMG_SIZE, VIDEO_BATCH_SIZE, VIDEO_SAMPLE_FPS, VIDEO_SMOOTHING,
+                    idx_to_class, interpret_prediction)
+from preprocessing import BatchBuffer
+
+# Dipakai jika sumber tidak melaporkan FPS (umum pada stream/kamera USB)
+FPS_DEFAULT = 30.0
+
+Frame = namedtuple("Frame", ["index", "waktu_ms", "array"])
+
+
+class VideoSourceError(RuntimeError):
+    pass
+
+
+def parse_source(source):
+    # "0", "1", ... berarti indeks kamera; selain itu path file atau URL
+    if isinstance(source, int):
+        return source
+    return int(source) if source.isdigit() else source
+
+
+def to_model_input(frame_bgr, size=IMG_SIZE):
+    # Frame BGR OpenCV -> array RGB uint8 (H, W, 3) siap dinormalisasi
+    kecil = cv2.resize(frame_bgr, size, interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(kecil, cv2.COLOR_BGR2RGB)
+
+
+class FrameReader:
+    def __init__(self, source, sample_fps=VIDEO_SAMPLE_FPS, buffer_size=2 * VIDEO_BATCH_SIZE):
+        self.source = parse_source(source)
+        self.live = not (isinstance(self.source, str) and os.path.isfile(self.source))
+        self._cap = cv2.VideoCapture(self.source)
+        if not self._cap.isOpened():
+            raise VideoSourceError(f"Sumber video tidak bisa dibuka: {source}")
+
+        fps = self._cap.get(cv2.CAP_PROP_FPS)
+        self.source_fps = fps if 0 < fps < 1000 else FPS_DEFAULT
+        jumlah = self._cap.get(cv2.CAP_PROP_FRAME_COUNT)
+        self.total_frames = int(jumlah) if not self.live and jumlah > 0 else None
+        self.sample_fps = sample_fps
+        self.stride = max(1, round(self.source_fps / sample_fps))
+        self.buffer_size = buffer_size
+
+        self.read = 0      # frame yang dibaca dari sumber
+        self.sampled = 0   # frame yang diambil untuk dianalisis
+        self.dropped = 0   # frame terambil yang dibuang karena pemroses tertinggal
+        self.finished = False
+        self._frames = deque()
+        self._cond = threading.Condition()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="video-reader", daemon=True)
+        self._thread.start()
+
+    def set_processing_rate(self, frames_per_second):
+        # Hanya untuk sumber langsung: ambil frame secepat yang sanggup
+        # diproses model (dengan sedikit cadangan), maksimal sample_fps.
+        if not self.live or frames_per_second <= 0:
+            return
+        laju = min(self.sample_fps, 0.9 * frames_per_second)
+        self.stride = max(1, math.ceil(self.source_fps / laju))
+
+    def _loop(self):
+        t_mulai = time.monotonic()
+        try:
+            while not self._stopped.is_set():
+                if not self._cap.grab():
+                    break  # akhir file atau stream terputus
+                indeks = self.read
+                self.read += 1
+                if indeks % self.stride:
+                    continue
+                ok, frame = self._cap.retrieve()
+                if not ok:
+                    continue
+                if self.live:
+                    waktu_ms = (time.monotonic() - t_mulai) * 1000
+                else:
+                    waktu_ms = indeks / self.source_fps * 1000
+                item = Frame(indeks, waktu_ms, to_model_input(frame))
+
+                with self._cond:
+                    if self.live:
+                        if len(self._frames) >= self.buffer_size:
+                            self._frames.popleft()
+                            self.dropped += 1
+                    else:
+                        self._cond.wait_for(
+                            lambda: len(self._frames) < self.buffer_size or self._stopped.is_set())
+                    self._frames.append(item)
+                    self.sampled += 1
+                    self._cond.notify_all()
+        finally:
+            self._cap.release()
+            with self._cond:
+                self.finished = True
+                self._cond.notify_all()
+
+    def read_batch(self, max_frames, timeout=1.0):
+        # Daftar kosong berarti belum ada frame (cek .finished untuk akhir sumber)
+        with self._cond:
+            self._cond.wait_for(lambda: self._frames or self.finished, timeout)
+            n = min(max_frames, len(self._frames))
+            batch = [self._frames.popleft() for _ in range(n)]
+            self._cond.notify_all()
+        return batch
+
+    def stop(self, timeout=5.0):
+        self._stopped.set()
+        with self._cond:
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class ProbabilitySmoother:
+    # Rata-rata bergerak eksponensial atas vektor probabilitas per frame
+    def __init__(self, alpha=VIDEO_SMOOTHING):
+        self.alpha = alpha
+        self.value = None
+
+    def update(self, probs):
+        probs = np.asarray(probs, dtype=np.float32)
+        if self.value is None:
+            self.value = probs.copy()
+        else:
+            self.value += self.alpha * (probs - self.value)
+        return self.value
+
+    def verdict(self):
+        return interpret_prediction(self.value)
+
+
+class VideoDetector:
+    def __init__(self, predict_fn, batch_size=VIDEO_BATCH_SIZE, smoothing=VIDEO_SMOOTHING, window_s=5.0):
+        # predict_fn menerima batch float32 (N, 299, 299, 3)
+        self.predict_fn = predict_fn
+        self.batch_size = batch_size
+        self.smoothing = smoothing
+        self.window_s = window_s
+        self._buffer = BatchBuffer(batch_size)
+
+    def run(self, reader, max_seconds=None):
+        # Generator: satu pembaruan (dict) setiap batch selesai dianalisis
+        smoother = ProbabilitySmoother(self.smoothing)
+        t_mulai = time.monotonic()
+        riwayat = deque()  # (waktu selesai, jumlah frame) untuk FPS bergulir
+        model_fps = None
+        diproses = 0
+
+        while max_seconds is None or time.monotonic() - t_mulai < max_seconds:
+            frames = reader.read_batch(self.batch_size)
+            if not frames:
+                if reader.finished:
+                    break
+                continue
+
+            n = len(frames)
+            for i, frame in enumerate(frames):
+                self._buffer.put(i, frame.array)
+            t0 = time.perf_counter()
+            preds = self.predict_fn(self._buffer.view(n))
+            detik_batch = time.perf_counter() - t0
+            for p in preds:
+                smoother.update(p)
+
+            # Kecepatan model (frame/detik saat inferensi) menentukan sampling sumber langsung
+            laju = n / detik_batch if detik_batch > 0 else float("inf")
+            model_fps = laju if model_fps is None else model_fps + 0.3 * (laju - model_fps)
+            reader.set_processing_rate(model_fps)
+
+            sekarang = time.monotonic()
+            diproses += n
+            riwayat.append((sekarang, n))
+            while riwayat and sekarang - riwayat[0][0] > self.window_s:
+                riwayat.popleft()
+            if len(riwayat) > 1:
+                fps = (sum(j for _, j in riwayat) - riwayat[0][1]) / (sekarang - riwayat[0][0])
+            else:
+                fps = n / max(sekarang - t_mulai, 1e-6)
+
+            label, confidence, status = smoother.verdict()
+            frame_label, frame_confidence, _ = interpret_prediction(preds[-1])
+            yield {
+                "waktu_ms": frames[-1].waktu_ms,
+                "frame": frames[-1].array,
+                "frame_label": frame_label,
+                "frame_confidence": frame_confidence,
+                "label": label,
+                "confidence": confidence,
+                "status": status,
+                "probabilities": smoother.value.copy(),
+                "processed": diproses,
+                "fps": fps,
+                "model_fps": model_fps,
+                "stride": reader.stride,
+                "dropped": reader.dropped,
+            }
+
+
+# ======================
+# CLI
+# ======================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Deteksi penyakit ikan dari file video, kamera atau URL stream.")
+    parser.add_argument("source", help="Path video, indeks kamera (0, 1, ...) atau URL (rtsp/http)")
+    parser.add_argument("--backend", default=None,
+                        help="keras / tflite-dynamic / tflite-fp16 / onnx / auto. Default: auto")
+    parser.add_argument("--sample-fps", type=float, default=VIDEO_SAMPLE_FPS,
+                        help="Frame yang dianalisis per detik video")
+    parser.add_argument("--batch-size", type=int, default=VIDEO_BATCH_SIZE)
+    parser.add_argument("--smoothing", type=float, default=VIDEO_SMOOTHING,
+                        help="Bobot EMA frame terbaru (0-1)")
+    parser.add_argument("--max-seconds", type=float, default=None,
+                        help="Berhenti setelah N detik (wajib masuk akal untuk kamera)")
+    parser.add_argument("-o", "--output", default=None, help="Tulis setiap pembaruan ke file JSONL")
+    args = parser.parse_args(argv)
+
+    from backends import load_backend
+    backend = load_backend(args.backend)
+    detector = VideoDetector(backend.predict, args.batch_size, args.smoothing)
+
+    out = open(args.output, "w", encoding='utf-8') if args.output else None
+    hasil = None
+    try:
+        with FrameReader(args.source, args.sample_fps, buffer_size=2 * args.batch_size) as reader:
+            for hasil in detector.run(reader, args.max_seconds):
+                print(f"{hasil['waktu_ms'] / 1000:7.1f}s  {hasil['label']} "
+                      f"{hasil['confidence'] * 100:.1f}% ({hasil['status']})  "
+                      f"{hasil['fps']:.1f} fps  dibuang {hasil['dropped']}", file=sys.stderr)
+                if out:
+                    baris = {k: v for k, v in hasil.items() if k not in ("frame", "probabilities")}
+                    baris["probabilities"] = {idx_to_class[i]: round(float(p), 6)
+                                              for i, p in enumerate(hasil["probabilities"])}
+                    out.write(json.dumps(baris, ensure_ascii=False) + "\n")
+            ringkasan = {"read": reader.read, "sampled": reader.sampled, "dropped": reader.dropped}
+    except VideoSourceError as e:
+        parser.error(str(e))
+    finally:
+        if out:
+            out.close()
+
+    if hasil is not None:
+        ringkasan.update(label=hasil["label"], confidence=round(hasil["confidence"], 4),
+                         status=hasil["status"], processed=hasil["processed"])
+    print(json.dumps(ringkasan, ensure_ascii=False), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())